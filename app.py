@@ -1,14 +1,36 @@
 #####################################################
 import os
-from flask import Flask, render_template, request, redirect, url_for, jsonify, flash
+import base64
+import hashlib
+import heapq
+import json
+import logging
+import math
+import random
+import re
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from itertools import islice
+import argon2
+import click
+from flask import Flask, Response, render_template, request, redirect, url_for, jsonify, flash, abort, g, has_request_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_migrate import Migrate
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
+from datetime import datetime, timedelta
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, SubmitField
-from wtforms.validators import DataRequired, Email, Length, EqualTo, ValidationError
-from sqlalchemy.orm import Session
+from wtforms.validators import DataRequired, Email, Length, EqualTo
+from sqlalchemy.orm import configure_mappers, joinedload, selectinload
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.dialects.postgresql import ExcludeConstraint
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.pool import NullPool, QueuePool
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
 
 app = Flask(__name__)
 
@@ -20,13 +42,191 @@ app.config['SQLALCHEMY_DATABASE_URI'] = uri
 
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SECRET_KEY'] = 'your_secret_key'
+app.config['PER_PAGE'] = int(os.environ.get('PER_PAGE', 50))
+app.config['ANALYTICS_LIVE'] = os.environ.get('ANALYTICS_LIVE') == '1'
+app.config['ROLLUP_REFRESH_SECONDS'] = int(os.environ.get('ROLLUP_REFRESH_SECONDS', 5))
+app.config['ANALYTICS_CACHE_SIZE'] = int(os.environ.get('ANALYTICS_CACHE_SIZE', 64))
+app.config['FACET_LIMIT'] = int(os.environ.get('FACET_LIMIT', 20))
+# Side of a cell in the in-process venue geo index, in degrees (0.25 is ~28 km),
+# rounded to the nearest size that divides 180. The index replays venue
+# location changes from a log that keeps the last GEO_CHANGE_LOG_SIZE of them.
+app.config['GEO_CELL_DEGREES'] = float(os.environ.get('GEO_CELL_DEGREES', 0.25))
+app.config['GEO_CHANGE_LOG_SIZE'] = int(os.environ.get('GEO_CHANGE_LOG_SIZE', 10000))
+app.config['USER_CACHE_SIZE'] = int(os.environ.get('USER_CACHE_SIZE', 1024))
+app.config['USER_CACHE_TTL'] = float(os.environ.get('USER_CACHE_TTL', 30))
+# Password hashing: 'pbkdf2' or 'argon2' (argon2id) and its cost. password_hash is
+# String(128), which fits both. Stored hashes with other parameters are
+# upgraded on the user's next successful login.
+app.config['PASSWORD_SCHEME'] = os.environ.get('PASSWORD_SCHEME', 'pbkdf2')
+app.config['PBKDF2_ITERATIONS'] = int(os.environ.get('PBKDF2_ITERATIONS', 600000))
+app.config['ARGON2_TIME_COST'] = int(os.environ.get('ARGON2_TIME_COST', 3))
+app.config['ARGON2_MEMORY_COST'] = int(os.environ.get('ARGON2_MEMORY_COST', 65536))
+app.config['ARGON2_PARALLELISM'] = int(os.environ.get('ARGON2_PARALLELISM', 1))
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+app.config['PASSWORD_HASH_TIMEOUT'] = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+app.config['SLOW_QUERY_MS'] = float(os.environ.get('SLOW_QUERY_MS', 100))
+app.config['SLOW_QUERY_SAMPLE_RATE'] = float(os.environ.get('SLOW_QUERY_SAMPLE_RATE', 1.0))
+app.config['SLOW_QUERY_LOG'] = os.environ.get('SLOW_QUERY_LOG')
+# Connection pool, per environment. With DB_EXTERNAL_POOLER=1 (PgBouncer or a
+# managed pooler in transaction mode) connections are not pooled in-process and
+# the statement timeout is set per transaction instead of per connection.
+app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 5))
+app.config['DB_MAX_OVERFLOW'] = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+app.config['DB_POOL_TIMEOUT'] = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+app.config['DB_POOL_RECYCLE'] = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+app.config['DB_POOL_PRE_PING'] = os.environ.get('DB_POOL_PRE_PING', '1') == '1'
+app.config['DB_STATEMENT_TIMEOUT_MS'] = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 0))
+app.config['DB_EXTERNAL_POOLER'] = os.environ.get('DB_EXTERNAL_POOLER') == '1'
+
+# Prometheus metrics. Under gunicorn every worker writes its samples to
+# PROMETHEUS_MULTIPROC_DIR (see gunicorn.conf.py) and /metrics merges them;
+# gauges use livesum so exited workers drop out of the totals.
+REQUEST_LATENCY = Histogram('ems_request_duration_seconds', 'Request latency by route',
+                            ['method', 'route', 'status'])
+REQUESTS_IN_FLIGHT = Gauge('ems_requests_in_flight', 'Requests currently being served', ['route'],
+                           multiprocess_mode='livesum')
+POOL_CHECKOUT_WAIT = Histogram('ems_db_pool_checkout_wait_seconds', 'Time spent getting a connection from the pool',
+                               buckets=(.0005, .001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30))
+POOL_SIZE = Gauge('ems_db_pool_size', 'Configured pool size', multiprocess_mode='livesum')
+POOL_CHECKED_OUT = Gauge('ems_db_pool_checked_out', 'Connections currently checked out', multiprocess_mode='livesum')
+POOL_OVERFLOW = Gauge('ems_db_pool_overflow', 'Connections open beyond the pool size', multiprocess_mode='livesum')
+CACHE_LOOKUPS = Counter('ems_cache_lookups_total', 'App cache lookups by result', ['cache', 'result'])
+
+class InstrumentedQueuePool(QueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        POOL_SIZE.set(self.size())
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start)
+            self.record_usage()
+
+    def _do_return_conn(self, record):
+        super()._do_return_conn(record)
+        self.record_usage()
+
+    def record_usage(self):
+        POOL_CHECKED_OUT.set(self.checkedout())
+        POOL_OVERFLOW.set(max(self.overflow(), 0))
+
+def engine_options(config):
+    if config['DB_EXTERNAL_POOLER']:
+        return {'poolclass': NullPool}
+    options = {'poolclass': InstrumentedQueuePool,
+               'pool_size': config['DB_POOL_SIZE'],
+               'max_overflow': config['DB_MAX_OVERFLOW'],
+               'pool_timeout': config['DB_POOL_TIMEOUT'],
+               'pool_recycle': config['DB_POOL_RECYCLE'],
+               'pool_pre_ping': config['DB_POOL_PRE_PING']}
+    if config['DB_STATEMENT_TIMEOUT_MS'] and config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql'):
+        options['connect_args'] = {'options': '-c statement_timeout=%d' % config['DB_STATEMENT_TIMEOUT_MS']}
+    return options
+
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
 
 db = SQLAlchemy(app)
+migrate = Migrate(app, db)
 
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
 
+access_log = app.logger.getChild('access')
+access_log.setLevel(logging.INFO)
+slow_query_log = app.logger.getChild('slow_query')
+slow_query_log.setLevel(logging.INFO)
+if app.config['SLOW_QUERY_LOG']:
+    slow_query_log.addHandler(logging.FileHandler(app.config['SLOW_QUERY_LOG']))
+
+def parameter_shape(parameters):
+    # Log the types of bound values, never the values themselves.
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)) and parameters and isinstance(parameters[0], (dict, list, tuple)):
+        return '%d x %s' % (len(parameters), parameter_shape(parameters[0]))
+    return [type(value).__name__ for value in parameters or ()]
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = (time.perf_counter() - conn.info['query_start'].pop()) * 1000
+    in_request = has_request_context()
+    if in_request:
+        g.query_count = g.get('query_count', 0) + 1
+        g.query_ms = g.get('query_ms', 0.0) + elapsed
+        if elapsed >= g.get('slowest_query_ms', 0.0):
+            g.slowest_query_ms = elapsed
+            g.slowest_query = statement
+    if elapsed >= app.config['SLOW_QUERY_MS'] and random.random() < app.config['SLOW_QUERY_SAMPLE_RATE']:
+        slow_query_log.warning('%.1fms route=%s params=%s sql=%s', elapsed,
+                               request.endpoint if in_request else '-', parameter_shape(parameters),
+                               ' '.join(statement.split()))
+
+def handle_error(context):
+    # A failed statement never reaches after_cursor_execute; drop its start time.
+    if context.connection is not None and context.statement is not None and context.connection.info.get('query_start'):
+        context.connection.info['query_start'].pop()
+
+def set_local_statement_timeout(conn):
+    # Transaction poolers reject startup options and may hand every
+    # transaction a different server connection, so scope it to the transaction.
+    conn.exec_driver_sql('SET LOCAL statement_timeout = %d' % app.config['DB_STATEMENT_TIMEOUT_MS'])
+
+with app.app_context():
+    db.event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    db.event.listen(db.engine, 'after_cursor_execute', after_cursor_execute)
+    db.event.listen(db.engine, 'handle_error', handle_error)
+    if app.config['DB_EXTERNAL_POOLER'] and app.config['DB_STATEMENT_TIMEOUT_MS'] \
+            and db.engine.dialect.name == 'postgresql':
+        db.event.listen(db.engine, 'begin', set_local_statement_timeout)
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def add_server_timing(response):
+    total_ms = (time.perf_counter() - g.request_start) * 1000
+    query_count = g.get('query_count', 0)
+    query_ms = g.get('query_ms', 0.0)
+    slowest_ms = g.get('slowest_query_ms', 0.0)
+    response.headers['Server-Timing'] = 'db;dur=%.1f;desc="%d queries", db-slowest;dur=%.1f, app;dur=%.1f' \
+        % (query_ms, query_count, slowest_ms, total_ms - query_ms)
+    access_log.info('%s %s %d %.1fms queries=%d db=%.1fms slowest=%.1fms %s', request.method, request.full_path.rstrip('?'),
+                    response.status_code, total_ms, query_count, query_ms, slowest_ms,
+                    ' '.join(g.get('slowest_query', '').split())[:120])
+    return response
+
+@app.before_request
+def track_in_flight():
+    g.metrics_route = request.url_rule.rule if request.url_rule else 'unmatched'
+    REQUESTS_IN_FLIGHT.labels(g.metrics_route).inc()
+
+@app.after_request
+def record_request_metrics(response):
+    REQUEST_LATENCY.labels(request.method, g.metrics_route, response.status_code) \
+        .observe(time.perf_counter() - g.request_start)
+    return response
+
+@app.teardown_request
+def release_in_flight(exc):
+    if 'metrics_route' in g:
+        REQUESTS_IN_FLIGHT.labels(g.metrics_route).dec()
+
+@app.route('/metrics')
+def metrics():
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
 @app.template_filter('datetimeformat')
 def datetimeformat(value, format='%Y-%m-%dT%H:%M'):
     return value.strftime(format)
@@ -38,11 +238,14 @@ class User(UserMixin, db.Model):
     password_hash = db.Column(db.String(128), nullable=False)
     email = db.Column(db.String(100), unique=True, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Counts password changes; the session fingerprint (session_id) is built on it.
+    password_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     events = db.relationship('Event', backref='user', passive_deletes=True)
     attendees = db.relationship('Attendee', backref='attendee_user', passive_deletes=True)
+    __table_args__ = (db.Index('ix_users_created_at_user_id', 'created_at', 'user_id'),)
 
     def get_id(self):
-        return self.user_id
+        return session_id(self.user_id, self.password_version)
 
 class Venue(db.Model):
     __tablename__ = 'venues'
@@ -50,8 +253,26 @@ class Venue(db.Model):
     name = db.Column(db.String(100), nullable=False)
     location = db.Column(db.String(255))
     capacity = db.Column(db.Integer)
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     events = db.relationship('Event', backref='venue', passive_deletes=True)
+    __table_args__ = (db.Index('ix_venues_name_venue_id', 'name', 'venue_id'),)
+
+# A venue without a capacity seats any number, so it sorts and compares as the
+# largest integer; the index is on that expression for the availability search.
+# The number is spelled out in the SQL, not bound, or SQLite will not match
+# the expression to the index.
+UNLIMITED_SEATS = 2 ** 31 - 1
+venue_seats = db.func.coalesce(Venue.capacity, db.literal_column(str(UNLIMITED_SEATS)))
+db.Index('ix_venues_seats_venue_id', venue_seats, Venue.venue_id)
+
+# Length assumed for events given without an end time; also what migration
+# 0010 backfilled existing events with.
+DEFAULT_EVENT_DURATION = timedelta(hours=2)
+
+def default_end_date(context):
+    return context.get_current_parameters()['event_date'] + DEFAULT_EVENT_DURATION
 
 class Event(db.Model):
     __tablename__ = 'events'
@@ -61,8 +282,22 @@ class Event(db.Model):
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
     event_date = db.Column(db.DateTime, nullable=False)
+    end_date = db.Column(db.DateTime, nullable=False, default=default_end_date)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    attendee_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     attendees = db.relationship('Attendee', backref='event', passive_deletes=True)
+    __table_args__ = (db.Index('ix_events_event_date_event_id', 'event_date', 'event_id'),
+                      db.Index('ix_events_venue_id_event_date', 'venue_id', 'event_date', 'event_id'),
+                      db.Index('ix_events_user_id_event_date', 'user_id', 'event_date', 'event_id'),
+                      db.Index('ix_events_title', 'title'),
+                      db.Index('brin_events_event_date', 'event_date', postgresql_using='brin',
+                               postgresql_with={'autosummarize': 'on'}).ddl_if(dialect='postgresql'),
+                      db.CheckConstraint('end_date >= event_date', name='ck_events_end_date'),
+                      # No two bookings of a venue overlap, checked at commit. Needs
+                      # btree_gist for the = on venue_id; see commit_booking.
+                      ExcludeConstraint((venue_id, '='), (db.func.tsrange(event_date, end_date), '&&'),
+                                        name='ex_events_venue_id_during', using='gist',
+                                        deferrable=True, initially='DEFERRED').ddl_if(dialect='postgresql'))
 
 class Attendee(db.Model):
     __tablename__ = 'attendees'
@@ -70,11 +305,795 @@ class Attendee(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.user_id', ondelete='CASCADE'), nullable=False)
     event_id = db.Column(db.Integer, db.ForeignKey('events.event_id', ondelete='CASCADE'), nullable=False)
     registration_date = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (db.UniqueConstraint('user_id', 'event_id', name='uq_attendees_user_id_event_id'),
+                      db.Index('ix_attendees_event_id', 'event_id'),
+                      db.Index('brin_attendees_registration_date', 'registration_date', postgresql_using='brin',
+                               postgresql_with={'autosummarize': 'on'}).ddl_if(dialect='postgresql'))
+
+# Analytics rollups. Per-event attendee totals live on events.attendee_count.
+class SignupRollup(db.Model):
+    __tablename__ = 'rollup_signups_daily'
+    day = db.Column(db.Date, primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+
+class EventDateRollup(db.Model):
+    __tablename__ = 'rollup_events_daily'
+    day = db.Column(db.Date, primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+
+class VenueEventRollup(db.Model):
+    __tablename__ = 'rollup_events_per_venue'
+    venue_id = db.Column(db.Integer, db.ForeignKey('venues.venue_id', ondelete='CASCADE'), primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+
+class UserEventRollup(db.Model):
+    __tablename__ = 'rollup_events_per_user'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id', ondelete='CASCADE'), primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+
+class RollupWatermark(db.Model):
+    __tablename__ = 'rollup_watermarks'
+    source = db.Column(db.String(50), primary_key=True)
+    last_id = db.Column(db.Integer, nullable=False, default=0)
+
+class TableVersion(db.Model):
+    __tablename__ = 'table_versions'
+    table_name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+# Venue location changes keyed by the venues table version they made, which
+# every process replays onto its geo index (venue_geo_index).
+class VenueChange(db.Model):
+    __tablename__ = 'venue_changes'
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    venue_id = db.Column(db.Integer, nullable=False)
+    old_latitude = db.Column(db.Float)
+    old_longitude = db.Column(db.Float)
+    new_latitude = db.Column(db.Float)
+    new_longitude = db.Column(db.Float)
+
+SIGNUP_ROLLUPS = ((SignupRollup, db.func.date(User.created_at)),)
+EVENT_ROLLUPS = ((EventDateRollup, db.func.date(Event.event_date)),
+                 (VenueEventRollup, Event.venue_id),
+                 (UserEventRollup, Event.user_id))
+
+# Full-text search over event titles and descriptions. PostgreSQL keeps a
+# generated tsvector column with a GIN index; SQLite (local use) mirrors the two
+# columns into an external-content FTS5 table kept current by triggers. Neither
+# is mapped on Event; they are created here for create_all and by migration 0007.
+EVENT_SEARCH_DDL = {
+    'postgresql': [
+        "ALTER TABLE events ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS "
+        "(setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(description, '')), 'B')) STORED",
+        "CREATE INDEX IF NOT EXISTS ix_events_search_vector ON events USING gin (search_vector)",
+    ],
+    'sqlite': [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(title, description, content='events', content_rowid='event_id')",
+        "CREATE TRIGGER IF NOT EXISTS events_fts_insert AFTER INSERT ON events BEGIN "
+        "INSERT INTO events_fts(rowid, title, description) VALUES (new.event_id, new.title, new.description); END",
+        "CREATE TRIGGER IF NOT EXISTS events_fts_delete AFTER DELETE ON events BEGIN "
+        "INSERT INTO events_fts(events_fts, rowid, title, description) VALUES ('delete', old.event_id, old.title, old.description); END",
+        "CREATE TRIGGER IF NOT EXISTS events_fts_update AFTER UPDATE OF title, description ON events BEGIN "
+        "INSERT INTO events_fts(events_fts, rowid, title, description) VALUES ('delete', old.event_id, old.title, old.description); "
+        "INSERT INTO events_fts(rowid, title, description) VALUES (new.event_id, new.title, new.description); END",
+    ],
+}
+for dialect, statements in EVENT_SEARCH_DDL.items():
+    for statement in statements:
+        db.event.listen(Event.__table__, 'after_create', db.DDL(statement).execute_if(dialect=dialect))
+db.event.listen(Event.__table__, 'before_create',
+                db.DDL('CREATE EXTENSION IF NOT EXISTS btree_gist').execute_if(dialect='postgresql'))
+
+def search_events(text):
+    # Matching events and the keyset keys that order them best match first:
+    # (-rank, event_id) on PostgreSQL, (bm25, event_id) on SQLite, where a
+    # lower bm25 score is a better match.
+    if db.engine.dialect.name == 'postgresql':
+        vector = db.literal_column('events.search_vector')
+        tsquery = db.func.websearch_to_tsquery('english', text)
+        # float8, so the rank survives the round trip through a page cursor
+        rank = -db.cast(db.func.ts_rank_cd(vector, tsquery), db.Float(53))
+        return Event.query.filter(vector.op('@@')(tsquery)), [rank, Event.event_id]
+    terms = ' '.join('"%s"' % term for term in re.findall(r'\w+', text))
+    if not terms:
+        return Event.query.filter(db.false()), [Event.event_id]
+    fts = db.table('events_fts', db.column('rowid'))
+    fts_table = db.literal_column('events_fts')
+    rank = db.func.bm25(fts_table, 10.0, 1.0)
+    query = Event.query.join(fts, fts.c.rowid == Event.event_id).filter(fts_table.op('MATCH')(terms))
+    return query, [rank, Event.event_id]
+
+def event_month(column):
+    if db.engine.dialect.name == 'postgresql':
+        return db.func.to_char(column, 'YYYY-MM')
+    return db.func.strftime('%Y-%m', column)
+
+def has_seats_left():
+    return Event.venue.has(db.or_(Venue.capacity.is_(None), Venue.capacity > Event.attendee_count))
+
+def event_filters(args):
+    # Facet name -> criterion for every filter present in the request args, and
+    # facet name -> the selected value, spelled as event_facet_counts returns it.
+    filters, selected = {}, {}
+    venue_id = args.get('venue', type=int)
+    if venue_id:
+        filters['venue'] = Event.venue_id == venue_id
+        selected['venue'] = str(venue_id)
+    organizer_id = args.get('organizer', type=int)
+    if organizer_id:
+        filters['organizer'] = Event.user_id == organizer_id
+        selected['organizer'] = str(organizer_id)
+    month = args.get('month', '')
+    if re.fullmatch(r'\d{4}-\d{2}', month):
+        # A date range rather than a month expression, so the indexes apply.
+        # Like a bad venue or organizer id, a month that does not exist is ignored.
+        try:
+            start = datetime.strptime(month, '%Y-%m')
+            end = (start + timedelta(days=32)).replace(day=1) - timedelta(microseconds=1)
+        except (ValueError, OverflowError):
+            pass
+        else:
+            filters['month'] = Event.event_date.between(start, end)
+            selected['month'] = month
+    if args.get('seats') == '1':
+        filters['seats'] = has_seats_left()
+    return filters, selected
+
+def event_facet_counts(filters, base=(), selected=None):
+    # Every facet's value counts in one UNION ALL round trip. Each facet is
+    # counted under all active filters except its own, so the alternatives to
+    # a selected value keep their counts. The selected value always makes its
+    # facet's top FACET_LIMIT, so the form can show it as selected.
+    def branch(facet, value, label, *joins):
+        count = db.func.count()
+        query = db.select(db.literal(facet).label('facet'), db.cast(value, db.String).label('value'),
+                          label.label('label'), count.label('total')).select_from(Event)
+        for target, onclause in joins:
+            query = query.join(target, onclause)
+        order = [count.desc()]
+        if facet in filters:
+            order.insert(0, db.func.max(db.case((filters[facet], 1), else_=0)).desc())
+        query = query.where(*base, *[criterion for name, criterion in filters.items() if name != facet]) \
+            .group_by(value, label).order_by(*order).limit(app.config['FACET_LIMIT'])
+        return db.select(query.subquery())
+    month = event_month(Event.event_date)
+    seats = db.case((has_seats_left(), '1'), else_='0')
+    union = db.union_all(branch('venue', Event.venue_id, Venue.name, (Venue, Venue.venue_id == Event.venue_id)),
+                         branch('organizer', Event.user_id, User.username, (User, User.user_id == Event.user_id)),
+                         branch('month', month, month),
+                         branch('seats', seats, seats))
+    facets = {'venue': [], 'organizer': [], 'month': [], 'seats': {}}
+    for facet, value, label, total in db.session.execute(union):
+        if facet == 'seats':
+            facets['seats'][value] = total
+        else:
+            facets[facet].append((value, label, total))
+    # A selected value that no event matches under the other filters still
+    # gets its option, with a count of 0.
+    labels = {'venue': lambda value: getattr(db.session.get(Venue, int(value)), 'name', value),
+              'organizer': lambda value: getattr(db.session.get(User, int(value)), 'username', value),
+              'month': lambda value: value}
+    for facet, value in (selected or {}).items():
+        if value not in [row[0] for row in facets[facet]]:
+            facets[facet].append((value, labels[facet](value), 0))
+    facets['venue'].sort(key=lambda row: -row[2])
+    facets['organizer'].sort(key=lambda row: -row[2])
+    facets['month'].sort()
+    return facets
+
+# Loading policies per view: listings pull their many-to-one rows in the same
+# SELECT, detail pages fetch the attendee collection with one extra IN query.
+# The backrefs only exist once the mappers are configured.
+configure_mappers()
+EVENT_LIST_LOADING = (joinedload(Event.venue), joinedload(Event.user))
+EVENT_DETAIL_LOADING = (selectinload(Event.attendees).joinedload(Attendee.attendee_user),)
+
+def overlapping_booking(venue_id, start, end, event_id=None):
+    # The booking at venue_id that overlaps [start, end), if any. Bookings of
+    # a venue never overlap, so in start order they are in end order too and
+    # only the last one starting before `end` can reach past `start`: one
+    # backward probe of the (venue_id, event_date) index, however many
+    # bookings the venue has. Zero-length bookings (double bookings from
+    # before end times existed, see migration 0010) overlap nothing.
+    query = Event.query.filter(Event.venue_id == venue_id, Event.event_date < end, Event.end_date > Event.event_date)
+    if event_id is not None:
+        query = query.filter(Event.event_id != event_id)
+    booking = query.order_by(Event.event_date.desc(), Event.event_id.desc()).first()
+    return booking if booking is not None and booking.end_date > start else None
+
+def available_venues(start, end, min_capacity=0):
+    # Venues seating at least min_capacity (any number when capacity is unset)
+    # and with no booking that
+    # overlaps [start, end). The anti-join only looks at the latest booking
+    # starting before `end` (see overlapping_booking), so each candidate from
+    # the capacity index costs one probe of the (venue_id, event_date) index
+    # instead of a scan of its bookings.
+    last_end = db.select(Event.end_date) \
+        .where(Event.venue_id == Venue.venue_id, Event.event_date < end, Event.end_date > Event.event_date) \
+        .order_by(Event.event_date.desc(), Event.event_id.desc()).limit(1).correlate(Venue).scalar_subquery()
+    return Venue.query.filter(venue_seats >= min_capacity, db.func.coalesce(last_end, start) <= start)
+
+def booking_window(args):
+    # (start, end, min capacity) from the availability search args, or None.
+    start = args.get('start', type=datetime.fromisoformat)
+    end = args.get('end', type=datetime.fromisoformat)
+    if start is None or end is None or end <= start:
+        return None
+    return start, end, max(args.get('capacity', 0, type=int), 0)
+
+def commit_booking(event):
+    # Commit the added or changed event unless it overlaps another booking at
+    # its venue; then roll back and return a message naming that booking.
+    # PostgreSQL enforces this with ex_events_venue_id_during at commit.
+    # Elsewhere the check runs here after write-locking the venue row, so
+    # concurrent bookings of one venue are checked one at a time.
+    db.session.flush()
+    venue_id, start, end, event_id = event.venue_id, event.event_date, event.end_date, event.event_id
+    conflict = None
+    if db.session.get_bind().dialect.name != 'postgresql':
+        db.session.execute(db.update(Venue).where(Venue.venue_id == venue_id).values(name=Venue.name))
+        conflict = overlapping_booking(venue_id, start, end, event_id)
+    if conflict is None:
+        try:
+            db.session.commit()
+            return None
+        except IntegrityError as e:
+            if getattr(getattr(e.orig, 'diag', None), 'constraint_name', None) != 'ex_events_venue_id_during':
+                raise
+            db.session.rollback()
+            conflict = overlapping_booking(venue_id, start, end, event_id)
+    if conflict is None:
+        message = 'The venue is already booked at that time.'
+    else:
+        message = 'The venue is already booked from %s to %s for "%s".' % (
+            datetimeformat(conflict.event_date, '%Y-%m-%d %H:%M'), datetimeformat(conflict.end_date, '%Y-%m-%d %H:%M'),
+            conflict.title)
+    db.session.rollback()
+    return message
+
+def form_booking_times(form):
+    # (start, end) from an event form; a missing end means the default length.
+    start = datetime.strptime(form['event_date'], '%Y-%m-%dT%H:%M')
+    end = form.get('end_date', '').strip()
+    end = datetime.strptime(end, '%Y-%m-%dT%H:%M') if end else start + DEFAULT_EVENT_DURATION
+    if end <= start:
+        raise ValueError('an event must end after it starts')
+    return start, end
+
+def dialect_insert(model):
+    # INSERT construct with ON CONFLICT support for the bound backend.
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        return postgresql.insert(model)
+    if dialect == 'sqlite':
+        return sqlite.insert(model)
+    raise NotImplementedError('ON CONFLICT is not supported on ' + dialect)
+
+def register_attendee(user_id, event_id):
+    # The unique (user_id, event_id) constraint decides whether the row is new, so
+    # concurrent double submits cannot create duplicates. The seat is then claimed
+    # with a conditional increment that row-locks only this event until commit.
+    stmt = dialect_insert(Attendee).values(user_id=user_id, event_id=event_id) \
+        .on_conflict_do_nothing(index_elements=['user_id', 'event_id'])
+    try:
+        if not db.session.execute(stmt).rowcount:
+            db.session.rollback()
+            return 'already_registered'
+    except IntegrityError:
+        # Foreign key violation: the event (or user) no longer exists.
+        db.session.rollback()
+        return 'not_found'
+    capacity = db.select(Venue.capacity).where(Venue.venue_id == Event.venue_id).scalar_subquery()
+    claim = db.update(Event).where(Event.event_id == event_id) \
+        .where(db.or_(capacity.is_(None), Event.attendee_count < capacity)) \
+        .values(attendee_count=Event.attendee_count + 1) \
+        .execution_options(synchronize_session=False)
+    if not db.session.execute(claim).rowcount:
+        db.session.rollback()
+        exists = db.session.query(Event.event_id).filter_by(event_id=event_id).scalar()
+        return 'sold_out' if exists else 'not_found'
+    db.session.commit()
+    # No version bump: one hot row written by every registration would queue
+    # them all behind each other. Attendee-based analytics expire on a timer
+    # instead (analytics_response).
+    return 'registered'
+
+def release_user_seats(user_id):
+    # Give a deleted user's seats back and drop their attendee rows in the same
+    # transaction. The rows are deleted here rather than left to the ON DELETE
+    # CASCADE: SQLite only enforces it with PRAGMA foreign_keys, which stays off
+    # because batch migrations rebuild tables by dropping them.
+    db.session.execute(db.update(Event)
+                       .where(Event.event_id.in_(db.select(Attendee.event_id).where(Attendee.user_id == user_id)))
+                       .values(attendee_count=Event.attendee_count - 1)
+                       .execution_options(synchronize_session=False))
+    db.session.execute(db.delete(Attendee).where(Attendee.user_id == user_id)
+                       .execution_options(synchronize_session=False))
+
+def reconcile_attendee_counts(batch_size=1000):
+    # Recount events.attendee_count in primary-key batches, one transaction per
+    # batch, rewriting only the rows that drifted. Returns the number corrected.
+    counted = db.select(db.func.count(Attendee.attendee_id)).where(Attendee.event_id == Event.event_id).scalar_subquery()
+    last_id, fixed = 0, 0
+    while True:
+        batch = [event_id for event_id, in db.session.query(Event.event_id).filter(Event.event_id > last_id)
+                 .order_by(Event.event_id).limit(batch_size)]
+        if not batch:
+            break
+        fixed += db.session.execute(db.update(Event)
+                                    .where(Event.event_id.in_(batch), Event.attendee_count != counted)
+                                    .values(attendee_count=counted)
+                                    .execution_options(synchronize_session=False)).rowcount
+        db.session.commit()
+        last_id = batch[-1]
+    bump_versions('events')
+    return fixed
+
+@app.cli.command('reconcile-attendee-counts')
+@click.option('--batch-size', default=1000, show_default=True, help='Events recounted per transaction.')
+def reconcile_attendee_counts_command(batch_size):
+    """Rebuild events.attendee_count from the attendees table."""
+    fixed = reconcile_attendee_counts(batch_size)
+    click.echo('Reconciled attendee counts, %d event(s) corrected.' % fixed)
+
+def bump_versions(*tables, commit=True):
+    # Called right after the write commits, in its own short transaction, so
+    # a hot write path never holds the version row while waiting on other locks.
+    # A reader racing the bump can only cache newer data under the old version.
+    # Returns the new version of each table. With commit=False the bump joins
+    # the caller's transaction instead (track_venue_location).
+    rows = [{'table_name': table, 'version': 1} for table in sorted(set(tables))]
+    stmt = dialect_insert(TableVersion).values(rows)
+    versions = dict(db.session.execute(stmt.on_conflict_do_update(index_elements=['table_name'],
+                                                                  set_={'version': TableVersion.version + 1})
+                                       .returning(TableVersion.table_name, TableVersion.version)).all())
+    if commit:
+        db.session.commit()
+    return versions
+
+def read_versions(tables):
+    versions = dict(db.session.query(TableVersion.table_name, TableVersion.version)
+                    .filter(TableVersion.table_name.in_(tables)))
+    return tuple(versions.get(table, 0) for table in tables)
+
+class LRUCache:
+    # Small per-process LRU with an optional TTL. The analytics cache keys its
+    # entries by the table versions they were computed from, so stale entries
+    # simply stop being looked up and age out.
+    def __init__(self, name, max_entries, ttl=None):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and (entry[0] is None or entry[0] > time.monotonic()):
+                self.entries.move_to_end(key)
+                CACHE_LOOKUPS.labels(self.name, 'hit').inc()
+                return entry[1]
+            if entry is not None:
+                del self.entries[key]
+            CACHE_LOOKUPS.labels(self.name, 'miss').inc()
+            return None
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl if self.ttl else None, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def pop(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+analytics_cache = LRUCache('analytics', app.config['ANALYTICS_CACHE_SIZE'])
+
+EARTH_RADIUS_KM = 6371.0088
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+class VenueGeoIndex:
+    # Per-process grid over venue coordinates. Each cell keeps parallel arrays
+    # of ids and coordinates (24 bytes a venue), so a million venues fit in a
+    # few tens of MB. `version` is the venues table version the contents match.
+    def __init__(self, cell_degrees):
+        # Whole cells only: a narrower last column would break the distance
+        # bounds, so the size is rounded to the nearest divisor of 180 (and 360).
+        self.rows = max(1, round(180 / cell_degrees))
+        self.cols = 2 * self.rows
+        self.cell = 180 / self.rows
+        self.cells = {}
+        self.size = 0
+        self.version = None
+        self.lock = threading.Lock()
+        self.reload_lock = threading.Lock()
+
+    def cell_of(self, lat, lng):
+        return min(int((lat + 90) / self.cell), self.rows - 1), int((lng + 180) / self.cell) % self.cols
+
+    def _insert(self, cells, venue_id, lat, lng):
+        ids, lats, lngs = cells.setdefault(self.cell_of(lat, lng), (array('q'), array('d'), array('d')))
+        ids.append(venue_id)
+        lats.append(lat)
+        lngs.append(lng)
+
+    def load(self, rows, version):
+        cells, size = {}, 0
+        for venue_id, lat, lng in rows:
+            self._insert(cells, venue_id, lat, lng)
+            size += 1
+        with self.lock:
+            self.cells, self.size, self.version = cells, size, version
+
+    def add(self, venue_id, lat, lng):
+        with self.lock:
+            self._insert(self.cells, venue_id, lat, lng)
+            self.size += 1
+
+    def remove(self, venue_id, lat, lng):
+        key = self.cell_of(lat, lng)
+        with self.lock:
+            entry = self.cells.get(key)
+            if entry is None or venue_id not in entry[0]:
+                return
+            i = entry[0].index(venue_id)
+            # Swap with the last slot so removal does not shift the arrays.
+            for column in entry:
+                column[i] = column[-1]
+                column.pop()
+            if not entry[0]:
+                del self.cells[key]
+            self.size -= 1
+
+    def ring(self, row, col, k):
+        # Cells at Chebyshev distance k from (row, col). Column offsets stay
+        # within one turn of the globe, so no cell is visited twice.
+        west, east = -min(k, (self.cols - 1) // 2), min(k, self.cols // 2)
+        for r in range(max(row - k, 0), min(row + k, self.rows - 1) + 1):
+            if abs(r - row) == k:
+                offsets = range(west, east + 1)
+            else:
+                offsets = [offset for offset in (-k, k) if west <= offset <= east]
+            for offset in offsets:
+                yield r, (col + offset) % self.cols
+
+    def ring_distance(self, row, col, key):
+        offset = (key[1] - col) % self.cols
+        if offset > self.cols // 2:
+            offset -= self.cols
+        return max(abs(key[0] - row), abs(offset))
+
+    def unscanned_km(self, lat, lng, row, col, k):
+        # Lower bound on the distance to any cell outside rings 0..k: the
+        # nearest parallel or meridian bounding the scanned block.
+        bound = math.inf
+        if row - k > 0:
+            bound = min(bound, math.radians(lat - ((row - k) * self.cell - 90)) * EARTH_RADIUS_KM)
+        if row + k < self.rows - 1:
+            bound = min(bound, math.radians((row + k + 1) * self.cell - 90 - lat) * EARTH_RADIUS_KM)
+        if k < self.cols // 2:
+            cos_lat = math.cos(math.radians(lat))
+            for degrees in (lng - ((col - k) * self.cell - 180), (col + k + 1) * self.cell - 180 - lng):
+                bound = min(bound, math.asin(min(1.0, cos_lat * abs(math.sin(math.radians(degrees))))) * EARTH_RADIUS_KM)
+        return bound
+
+    def nearby(self, lat, lng, radius_km=None):
+        # (distance_km, venue_id) in increasing distance, within radius_km if
+        # given. Rings of cells are scanned outwards from the query's cell and
+        # a candidate is yielded once no unscanned cell can hold anything
+        # closer, so a caller that stops early never scans further.
+        row, col = self.cell_of(lat, lng)
+        limit = math.inf if radius_km is None else radius_km
+        heap, remaining = [], self.size
+        for k in range(max(self.rows, self.cols // 2 + 1)):
+            with self.lock:
+                if 8 * k > len(self.cells):
+                    # Sparse grid: the rings ahead are mostly empty, so visit
+                    # the remaining occupied cells directly and finish.
+                    keys = [key for key in self.cells if self.ring_distance(row, col, key) >= k]
+                    k = math.inf
+                else:
+                    keys = self.ring(row, col, k)
+                for key in keys:
+                    entry = self.cells.get(key)
+                    if entry is not None:
+                        for venue_id, venue_lat, venue_lng in zip(*entry):
+                            heapq.heappush(heap, (haversine_km(lat, lng, venue_lat, venue_lng), venue_id))
+            if k == math.inf:
+                break
+            bound = min(self.unscanned_km(lat, lng, row, col, k), limit)
+            while heap and heap[0][0] <= bound:
+                yield heapq.heappop(heap)
+                remaining -= 1
+            if bound >= limit or remaining <= 0:
+                return
+        while heap and heap[0][0] <= limit:
+            yield heapq.heappop(heap)
+
+geo_index = VenueGeoIndex(app.config['GEO_CELL_DEGREES'])
+
+def venue_geo_index():
+    version = read_versions(('venues',))[0]
+    if geo_index.version != version:
+        with geo_index.reload_lock:
+            if geo_index.version != version and not replay_venue_changes(version):
+                rows = db.session.execute(db.select(Venue.venue_id, Venue.latitude, Venue.longitude)
+                                          .where(Venue.latitude.is_not(None), Venue.longitude.is_not(None))
+                                          .execution_options(yield_per=10000))
+                geo_index.load(rows, version)
+    return geo_index
+
+def replay_venue_changes(version):
+    # Bring the geo index up to version from the venue change log, whichever
+    # process made the changes. False when a version in between is missing from
+    # the log (pruned, or a bulk load that bumped the version without logging),
+    # and the grid has to be reloaded instead.
+    if geo_index.version is None or geo_index.version > version:
+        return False
+    changes = db.session.query(VenueChange).filter(VenueChange.version > geo_index.version,
+                                                   VenueChange.version <= version).order_by(VenueChange.version).all()
+    if len(changes) != version - geo_index.version:
+        return False
+    for change in changes:
+        old, new = (change.old_latitude, change.old_longitude), (change.new_latitude, change.new_longitude)
+        if old == new:
+            continue
+        if None not in old:
+            geo_index.remove(change.venue_id, *old)
+        if None not in new:
+            geo_index.add(change.venue_id, *new)
+    geo_index.version = version
+    return True
+
+def track_venue_location(venue_id, old=(None, None), new=(None, None), tables=('venues',)):
+    # Bump the venues version (and any other tables written) and log the
+    # location change under the new version, in the venue write's own
+    # transaction: the caller commits all three together, or none of them.
+    # Every process's index replays the change on its next lookup.
+    versions = bump_versions(*tables, commit=False)
+    db.session.add(VenueChange(version=versions['venues'], venue_id=venue_id, old_latitude=old[0],
+                               old_longitude=old[1], new_latitude=new[0], new_longitude=new[1]))
+    db.session.execute(db.delete(VenueChange)
+                       .where(VenueChange.version <= versions['venues'] - app.config['GEO_CHANGE_LOG_SIZE']))
+
+def locked_venue_or_404(venue_id):
+    # The venue, write-locked until commit, so the old coordinates logged by
+    # track_venue_location are still current when the change commits. SQLite
+    # ignores FOR UPDATE; a no-op write takes its database lock first.
+    if db.session.get_bind().dialect.name != 'postgresql':
+        db.session.execute(db.update(Venue).where(Venue.venue_id == venue_id).values(name=Venue.name))
+    return Venue.query.filter_by(venue_id=venue_id).with_for_update().first_or_404()
+
+def form_coordinates(form):
+    # Optional (latitude, longitude) from a venue form: both or neither.
+    latitude, longitude = form.get('latitude', '').strip(), form.get('longitude', '').strip()
+    if not latitude and not longitude:
+        return None, None
+    latitude, longitude = float(latitude), float(longitude)
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError('coordinates out of range')
+    return latitude, longitude
+
+def fold_rollups(rollups, criteria, sign=1):
+    # Add (or subtract) the rows matching criteria into each rollup with one
+    # INSERT ... SELECT ... GROUP BY ... ON CONFLICT DO UPDATE per rollup.
+    for rollup, key in rollups:
+        key_column = rollup.__table__.primary_key.columns[0]
+        delta = db.select(key, db.func.count() * sign).where(key.is_not(None), *criteria).group_by(key)
+        stmt = dialect_insert(rollup).from_select([key_column.name, 'total'], delta)
+        db.session.execute(stmt.on_conflict_do_update(index_elements=[key_column],
+                                                      set_={'total': rollup.total + stmt.excluded.total}))
+
+def rollup_folded(pk, source):
+    # Rows at or below the watermark are already counted in the rollups, so
+    # updates and deletes of those rows must be folded back out explicitly.
+    return pk <= db.select(RollupWatermark.last_id).where(RollupWatermark.source == source).scalar_subquery()
+
+def adjust_folded_users(*criteria, sign):
+    fold_rollups(SIGNUP_ROLLUPS, (*criteria, rollup_folded(User.user_id, 'users')), sign=sign)
+
+def adjust_folded_events(*criteria, sign):
+    fold_rollups(EVENT_ROLLUPS, (*criteria, rollup_folded(Event.event_id, 'events')), sign=sign)
+
+def refresh_rollups():
+    # Fold rows past each source's high-water mark into the rollups. Rows newer
+    # than the refresh interval wait for the next pass, since a transaction that
+    # took a lower id may still be in flight and would otherwise be skipped.
+    cutoff = datetime.utcnow() - timedelta(seconds=app.config['ROLLUP_REFRESH_SECONDS'])
+    marks = dict(db.session.query(RollupWatermark.source, RollupWatermark.last_id))
+    advanced = False
+    for source, model, pk, rollups in (('users', User, User.user_id, SIGNUP_ROLLUPS),
+                                       ('events', Event, Event.event_id, EVENT_ROLLUPS)):
+        last = marks.get(source)
+        if last is None:
+            db.session.execute(dialect_insert(RollupWatermark).values(source=source, last_id=0)
+                               .on_conflict_do_nothing(index_elements=['source']))
+            last = 0
+        newest, unsettled = db.session.query(db.func.max(pk), db.func.min(db.case((model.created_at >= cutoff, pk)))) \
+            .filter(pk > last).one()
+        high = unsettled - 1 if unsettled is not None else newest
+        if high is not None and high > last:
+            # Compare-and-set on the watermark: a concurrent refresher that got
+            # there first makes this a no-op instead of a double count.
+            claimed = db.session.execute(db.update(RollupWatermark)
+                                         .where(RollupWatermark.source == source, RollupWatermark.last_id == last)
+                                         .values(last_id=high)
+                                         .execution_options(synchronize_session=False)).rowcount
+            if not claimed:
+                db.session.rollback()
+                continue
+            fold_rollups(rollups, (pk > last, pk <= high))
+            advanced = True
+        db.session.commit()
+    if advanced:
+        bump_versions('rollups')
+
+_rollups_refreshed_at = 0.0
+
+def use_live_analytics():
+    # ?live=1 (or ANALYTICS_LIVE) aggregates the raw tables so the two can be
+    # compared; otherwise make sure the rollups are at most one interval old.
+    global _rollups_refreshed_at
+    if request.args.get('live') == '1' or app.config['ANALYTICS_LIVE']:
+        return True
+    if time.monotonic() - _rollups_refreshed_at >= app.config['ROLLUP_REFRESH_SECONDS']:
+        refresh_rollups()
+        _rollups_refreshed_at = time.monotonic()
+    return False
+
+@app.cli.command('refresh-rollups')
+@click.option('--rebuild', is_flag=True, help='Discard the rollups and recompute them from scratch.')
+def refresh_rollups_command(rebuild):
+    """Fold new users and events into the analytics rollup tables."""
+    if rebuild:
+        for rollup, _ in SIGNUP_ROLLUPS + EVENT_ROLLUPS:
+            db.session.query(rollup).delete()
+        db.session.query(RollupWatermark).delete()
+        db.session.commit()
+    refresh_rollups()
+    click.echo('Analytics rollups refreshed.')
+
+class KeysetPage:
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+def encode_cursor(values):
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+def decode_cursor(cursor, keys):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if len(payload) != len(keys):
+            raise ValueError(cursor)
+        return [datetime.fromisoformat(value) if isinstance(key.type, db.DateTime) and value is not None else value
+                for key, value in zip(keys, payload)]
+    except (ValueError, TypeError):
+        abort(400)
+
+def keyset_paginate(query, keys, per_page=None):
+    # Seek on the (sort key, primary key) tuple instead of OFFSET, so that every
+    # page is a bounded index range scan however deep the reader has paged.
+    per_page = per_page or app.config['PER_PAGE']
+    after = request.args.get('after')
+    before = request.args.get('before')
+    position = db.tuple_(*keys)
+    query = query.add_columns(*keys)
+    if before:
+        rows = query.filter(position < db.tuple_(*decode_cursor(before, keys))) \
+            .order_by(*[key.desc() for key in keys]).limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        prev_cursor = encode_cursor(rows[0][1:]) if has_more else None
+        next_cursor = encode_cursor(rows[-1][1:]) if rows else None
+    else:
+        if after:
+            query = query.filter(position > db.tuple_(*decode_cursor(after, keys)))
+        rows = query.order_by(*keys).limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(rows[-1][1:]) if has_more else None
+        prev_cursor = encode_cursor(rows[0][1:]) if after and rows else None
+    return KeysetPage([row[0] for row in rows], next_cursor, prev_cursor)
+
+def session_id(user_id, password_version):
+    # The session stores the user id plus the password version, so changing the
+    # password signs out every other session of that user. A rehash on login
+    # keeps the version, and with it the user's other sessions.
+    return '%d:%d' % (user_id, password_version)
+
+class UserIdentity(UserMixin):
+    # Detached snapshot of the columns current_user needs, cheap to cache and
+    # safe to share between requests.
+    def __init__(self, user_id, username, email, password_version):
+        self.user_id = user_id
+        self.username = username
+        self.email = email
+        self.id = session_id(user_id, password_version)
+
+    def get_id(self):
+        return self.id
+
+def argon2_hasher():
+    return argon2.PasswordHasher(time_cost=app.config['ARGON2_TIME_COST'],
+                                 memory_cost=app.config['ARGON2_MEMORY_COST'],
+                                 parallelism=app.config['ARGON2_PARALLELISM'])
+
+def make_password_hash(password):
+    if app.config['PASSWORD_SCHEME'] == 'argon2':
+        return argon2_hasher().hash(password)
+    return generate_password_hash(password, method='pbkdf2:sha256:%d' % app.config['PBKDF2_ITERATIONS'])
+
+def password_matches(password_hash, password):
+    # Returns (matches, needs_rehash); needs_rehash is set when the hash was made
+    # with another scheme or cost than the one configured now.
+    if password_hash.startswith('$argon2'):
+        try:
+            argon2_hasher().verify(password_hash, password)
+        except (argon2.exceptions.VerificationError, argon2.exceptions.InvalidHashError):
+            return False, False
+        return True, app.config['PASSWORD_SCHEME'] != 'argon2' or argon2_hasher().check_needs_rehash(password_hash)
+    if not check_password_hash(password_hash, password):
+        return False, False
+    return True, app.config['PASSWORD_SCHEME'] != 'pbkdf2' or \
+        password_hash.split('$', 1)[0] != 'pbkdf2:sha256:%d' % app.config['PBKDF2_ITERATIONS']
+
+# Hashing is CPU-bound on purpose. The bounded pool caps how many cores a login
+# burst can take, and the hashing libraries release the GIL, so with gthread
+# workers (gunicorn.conf.py) the worker's other threads keep serving pages.
+password_executor = ThreadPoolExecutor(max_workers=app.config['PASSWORD_HASH_WORKERS'],
+                                       thread_name_prefix='password-hash')
+
+def run_password_task(fn, *args):
+    future = password_executor.submit(fn, *args)
+    try:
+        return future.result(timeout=app.config['PASSWORD_HASH_TIMEOUT'])
+    except FutureTimeoutError:
+        future.cancel()
+        abort(503)
+
+def hash_password(password):
+    return run_password_task(make_password_hash, password)
+
+def verify_password(password_hash, password):
+    return run_password_task(password_matches, password_hash, password)
+
+user_cache = LRUCache('users', app.config['USER_CACHE_SIZE'], ttl=app.config['USER_CACHE_TTL'])
 
 @login_manager.user_loader
 def load_user(user_id):
-    with Session(db.engine) as session:
-        return session.get(User, int(user_id))
+    identity = user_cache.get(user_id)
+    if identity is None:
+        try:
+            pk = int(user_id.split(':', 1)[0])
+        except ValueError:
+            return None
+        row = db.session.execute(db.select(User.user_id, User.username, User.email, User.password_version)
+                                 .where(User.user_id == pk)).first()
+        if row is None:
+            return None
+        identity = UserIdentity(*row)
+        user_cache.put(identity.id, identity)
+    # A stale fingerprint (password changed) or a pre-fingerprint session id
+    # does not match, and the user has to log in again.
+    return identity if identity.id == user_id else None
+
+def unique_violation_field(error, fields):
+    # Which of fields a unique-constraint IntegrityError is about: PostgreSQL
+    # reports the constraint (users_email_key), SQLite the column (users.email).
+    diag = getattr(error.orig, 'diag', None)
+    detail = (getattr(diag, 'constraint_name', None) or str(error.orig)).lower()
+    return next((field for field in fields if field in detail), None)
 
 class RegistrationForm(FlaskForm):
     username = StringField('Username', validators=[DataRequired(), Length(min=4, max=50)])
@@ -83,15 +1102,9 @@ class RegistrationForm(FlaskForm):
     confirm_password = PasswordField('Confirm Password', validators=[DataRequired(), EqualTo('password')])
     submit = SubmitField('Sign Up')
 
-    def validate_username(self, username):
-        user = User.query.filter_by(username=username.data).first()
-        if user:
-            raise ValidationError('Username is already taken.')
-
-    def validate_email(self, email):
-        user = User.query.filter_by(email=email.data).first()
-        if user:
-            raise ValidationError('Email is already registered.')
+    # Uniqueness is left to the database constraints; signup() maps a violation
+    # back onto the field with these messages.
+    unique_errors = {'username': 'Username is already taken.', 'email': 'Email is already registered.'}
 
 class LoginForm(FlaskForm):
     email = StringField('Email', validators=[DataRequired(), Email()])
@@ -102,11 +1115,24 @@ class LoginForm(FlaskForm):
 def signup():
     form = RegistrationForm()
     if form.validate_on_submit():
-        hashed_password = generate_password_hash(form.password.data, method='pbkdf2:sha256')
+        hashed_password = hash_password(form.password.data)
         new_user = User(username=form.username.data, email=form.email.data, password_hash=hashed_password)
         db.session.add(new_user)
+        try:
+            db.session.flush()
+        except IntegrityError as e:
+            db.session.rollback()
+            field = unique_violation_field(e, form.unique_errors)
+            if field is None:
+                raise
+            getattr(form, field).errors.append(form.unique_errors[field])
+            return render_template('signup.html', form=form)
+        # Built before the commit expires new_user, so logging in needs no reload.
+        identity = UserIdentity(new_user.user_id, new_user.username, new_user.email, new_user.password_version)
         db.session.commit()
-        login_user(new_user)
+        bump_versions('users')
+        user_cache.put(identity.id, identity)
+        login_user(identity)
         flash('Signup successful! You are now logged in.', 'success')
         return redirect(url_for('index'))
     return render_template('signup.html', form=form)
@@ -116,7 +1142,12 @@ def login():
     form = LoginForm()
     if form.validate_on_submit():
         user = User.query.filter_by(email=form.email.data).first()
-        if user and check_password_hash(user.password_hash, form.password.data):
+        matches, needs_rehash = verify_password(user.password_hash, form.password.data) if user else (False, False)
+        if matches:
+            if needs_rehash:
+                user.password_hash = hash_password(form.password.data)
+                db.session.commit()
+                bump_versions('users')
             login_user(user)
             flash('Login successful!', 'success')
             return redirect(url_for('index'))
@@ -134,12 +1165,13 @@ def logout():
 @app.route('/register_event/<int:event_id>', methods=['POST'])
 @login_required
 def register_event(event_id):
-    event = Event.query.get_or_404(event_id)
-    if not Attendee.query.filter_by(user_id=current_user.user_id, event_id=event.event_id).first():
-        attendee = Attendee(user_id=current_user.user_id, event_id=event.event_id)
-        db.session.add(attendee)
-        db.session.commit()
+    status = register_attendee(current_user.user_id, event_id)
+    if status == 'not_found':
+        abort(404)
+    if status == 'registered':
         flash('You have successfully registered for the event.', 'success')
+    elif status == 'sold_out':
+        flash('Sorry, this event is sold out.', 'danger')
     else:
         flash('You are already registered for this event.', 'info')
     return redirect(url_for('events'))
@@ -151,14 +1183,14 @@ def index():
 @app.route('/users')
 @login_required
 def users():
-    users = User.query.all()
-    return render_template('users.html', users=users)
+    page = keyset_paginate(User.query, [User.created_at, User.user_id])
+    return render_template('users.html', users=page.items, page=page)
 
 @app.route('/venues')
 @login_required
 def venues():
-    venues = Venue.query.all()
-    return render_template('venues.html', venues=venues)
+    page = keyset_paginate(Venue.query, [Venue.name, Venue.venue_id])
+    return render_template('venues.html', venues=page.items, page=page)
 
 @app.route('/add_venue', methods=['GET', 'POST'])
 @login_required
@@ -167,9 +1199,16 @@ def add_venue():
         name = request.form['name']
         location = request.form['location']
         capacity = request.form['capacity']
-        new_venue = Venue(name=name, location=location, capacity=capacity)
+        try:
+            latitude, longitude = form_coordinates(request.form)
+        except ValueError:
+            flash('Enter both latitude (-90 to 90) and longitude (-180 to 180), or neither.', 'danger')
+            return render_template('add_venue.html')
+        new_venue = Venue(name=name, location=location, capacity=capacity, latitude=latitude, longitude=longitude)
         try:
             db.session.add(new_venue)
+            db.session.flush()
+            track_venue_location(new_venue.venue_id, new=(latitude, longitude))
             db.session.commit()
             flash('Venue added successfully!', 'success')
             return redirect(url_for('venues'))
@@ -181,30 +1220,114 @@ def add_venue():
 @app.route('/update_venue/<int:venue_id>', methods=['GET', 'POST'])
 @login_required
 def update_venue(venue_id):
-    venue = Venue.query.get_or_404(venue_id)
     if request.method == 'POST':
+        venue = locked_venue_or_404(venue_id)
+        try:
+            latitude, longitude = form_coordinates(request.form)
+        except ValueError:
+            db.session.rollback()
+            flash('Enter both latitude (-90 to 90) and longitude (-180 to 180), or neither.', 'danger')
+            return render_template('update_venue.html', venue=venue)
+        old = (venue.latitude, venue.longitude)
         venue.name = request.form['name']
         venue.location = request.form['location']
         venue.capacity = request.form['capacity']
+        venue.latitude, venue.longitude = latitude, longitude
+        track_venue_location(venue_id, old=old, new=(latitude, longitude))
         db.session.commit()
         flash('Venue updated successfully!', 'success')
         return redirect(url_for('venues'))
-    return render_template('update_venue.html', venue=venue)
+    return render_template('update_venue.html', venue=Venue.query.get_or_404(venue_id))
 
 @app.route('/delete_venue/<int:venue_id>', methods=['POST'])
 @login_required
 def delete_venue(venue_id):
-    venue = Venue.query.get_or_404(venue_id)
+    venue = locked_venue_or_404(venue_id)
+    old = (venue.latitude, venue.longitude)
+    adjust_folded_events(Event.venue_id == venue.venue_id, sign=-1)
     db.session.delete(venue)
+    track_venue_location(venue_id, old=old, tables=('venues', 'events', 'attendees'))
     db.session.commit()
     flash('Venue deleted successfully!', 'success')
     return redirect(url_for('venues'))
 
+@app.route('/api/venues/available')
+@login_required
+def api_venues_available():
+    # Venues free for the whole of start..end (ISO datetimes) seating at least
+    # capacity, smallest first, a page at a time (after=next_cursor).
+    window = booking_window(request.args)
+    if window is None:
+        abort(400)
+    page = keyset_paginate(available_venues(*window), [venue_seats, Venue.venue_id])
+    return jsonify({'venues': [{'venue_id': venue.venue_id, 'name': venue.name, 'location': venue.location,
+                                'capacity': venue.capacity} for venue in page.items],
+                    'next_cursor': page.next_cursor})
+
+@app.route('/api/venues/nearby')
+@login_required
+def api_venues_nearby():
+    # Nearest venues to lat/lng (limit, default 10), optionally only within
+    # radius_km. With from and/or to (ISO dates or datetimes, from <= date < to)
+    # only venues with events in that window count, and their events are
+    # listed. Candidates come from the geo index in distance order and their
+    # events are fetched a growing batch at a time via (venue_id, event_date).
+    lat = request.args.get('lat', type=float)
+    lng = request.args.get('lng', type=float)
+    if lat is None or lng is None or not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        abort(400)
+    radius_km = request.args.get('radius_km', type=float)
+    limit = max(1, min(request.args.get('limit', 10, type=int), 100))
+    window = []
+    start = request.args.get('from', type=datetime.fromisoformat)
+    if start is not None:
+        window.append(Event.event_date >= start)
+    end = request.args.get('to', type=datetime.fromisoformat)
+    if end is not None:
+        window.append(Event.event_date < end)
+    candidates = venue_geo_index().nearby(lat, lng, radius_km)
+    events = {}
+    if not window:
+        found = list(islice(candidates, limit))
+    else:
+        found, batch_size = [], limit * 4
+        while len(found) < limit:
+            batch = list(islice(candidates, batch_size))
+            if not batch:
+                break
+            rows = db.session.execute(db.select(Event.venue_id, Event.event_id, Event.title, Event.event_date)
+                                      .where(Event.venue_id.in_([venue_id for _, venue_id in batch]), *window)
+                                      .order_by(Event.venue_id, Event.event_date))
+            for venue_id, event_id, title, event_date in rows:
+                events.setdefault(venue_id, []).append({'event_id': event_id, 'title': title,
+                                                        'event_date': event_date.isoformat()})
+            found.extend(candidate for candidate in batch if candidate[1] in events)
+            batch_size = min(batch_size * 2, 5000)
+        found = found[:limit]
+    venues = {venue.venue_id: venue for venue in Venue.query.filter(Venue.venue_id.in_([venue_id for _, venue_id in found]))}
+    return jsonify([{'venue_id': venue_id, 'name': venues[venue_id].name, 'location': venues[venue_id].location,
+                     'capacity': venues[venue_id].capacity, 'latitude': venues[venue_id].latitude,
+                     'longitude': venues[venue_id].longitude, 'distance_km': round(distance, 3),
+                     **({'events': events[venue_id]} if window else {})}
+                    for distance, venue_id in found if venue_id in venues])
+
 @app.route('/events')
 @login_required
 def events():
-    events = Event.query.all()
-    return render_template('events.html', events=events)
+    q = request.args.get('q', '').strip()
+    filters, selected = event_filters(request.args)
+    if q:
+        query, keys = search_events(q)
+        base = [Event.event_id.in_(query.with_entities(Event.event_id).statement.correlate(None))]
+    else:
+        query, keys = Event.query, [Event.event_date, Event.event_id]
+        base = []
+    page = keyset_paginate(query.filter(*filters.values()).options(*EVENT_LIST_LOADING), keys)
+    facets = event_facet_counts(filters, base, selected)
+    # The search and filters to carry over into the pagination links.
+    params = {name: request.args[name] for name in ('q', 'venue', 'organizer', 'month', 'seats') if request.args.get(name)}
+    return render_template('events.html', events=page.items, page=page, q=q, facets=facets, params=params,
+                           selected=selected)
 
 @app.route('/add_event', methods=['GET', 'POST'])
 @login_required
@@ -214,33 +1337,58 @@ def add_event():
         venue_id = request.form['venue_id']
         title = request.form['title']
         description = request.form['description']
-        event_date = datetime.strptime(request.form['event_date'], '%Y-%m-%dT%H:%M')
-        new_event = Event(user_id=user_id, venue_id=venue_id, title=title, description=description, event_date=event_date)
         try:
-            db.session.add(new_event)
-            db.session.commit()
-            flash('Event added successfully!', 'success')
-            return redirect(url_for('events'))
-        except Exception as e:
-            db.session.rollback()
-            flash('Error: ' + str(e.orig), 'danger')
+            event_date, end_date = form_booking_times(request.form)
+        except ValueError:
+            flash('Enter a start and an end time, with the end after the start.', 'danger')
+        else:
+            new_event = Event(user_id=user_id, venue_id=venue_id, title=title, description=description,
+                              event_date=event_date, end_date=end_date)
+            try:
+                db.session.add(new_event)
+                conflict = commit_booking(new_event)
+                if conflict is None:
+                    bump_versions('events')
+                    flash('Event added successfully!', 'success')
+                    return redirect(url_for('events'))
+                flash(conflict, 'danger')
+            except Exception as e:
+                db.session.rollback()
+                flash('Error: ' + str(e.orig), 'danger')
     users = User.query.all()
-    venues = Venue.query.all()
-    return render_template('add_event.html', users=users, venues=venues)
+    # With an availability search in the query string, offer only the venues
+    # free for that window, smallest first.
+    window = booking_window(request.args)
+    if window is not None:
+        venues = available_venues(*window).order_by(venue_seats, Venue.venue_id).all()
+    else:
+        venues = Venue.query.all()
+    return render_template('add_event.html', users=users, venues=venues, window=window)
 
 @app.route('/update_event/<int:event_id>', methods=['GET', 'POST'])
 @login_required
 def update_event(event_id):
-    event = Event.query.get_or_404(event_id)
+    event = Event.query.options(*EVENT_DETAIL_LOADING).get_or_404(event_id)
     if request.method == 'POST':
-        event.user_id = request.form['user_id']
-        event.venue_id = request.form['venue_id']
-        event.title = request.form['title']
-        event.description = request.form['description']
-        event.event_date = datetime.strptime(request.form['event_date'], '%Y-%m-%dT%H:%M')
-        db.session.commit()
-        flash('Event updated successfully!', 'success')
-        return redirect(url_for('events'))
+        try:
+            event_date, end_date = form_booking_times(request.form)
+        except ValueError:
+            flash('Enter a start and an end time, with the end after the start.', 'danger')
+        else:
+            adjust_folded_events(Event.event_id == event.event_id, sign=-1)
+            event.user_id = request.form['user_id']
+            event.venue_id = request.form['venue_id']
+            event.title = request.form['title']
+            event.description = request.form['description']
+            event.event_date, event.end_date = event_date, end_date
+            db.session.flush()
+            adjust_folded_events(Event.event_id == event.event_id, sign=1)
+            conflict = commit_booking(event)
+            if conflict is None:
+                bump_versions('events')
+                flash('Event updated successfully!', 'success')
+                return redirect(url_for('events'))
+            flash(conflict, 'danger')
     users = User.query.all()
     venues = Venue.query.all()
     return render_template('update_event.html', event=event, users=users, venues=venues)
@@ -250,10 +1398,12 @@ def update_event(event_id):
 def delete_event(event_id):
     event = Event.query.get_or_404(event_id)
     try:
+        adjust_folded_events(Event.event_id == event_id, sign=-1)
         # Delete all attendees related to the event first
         Attendee.query.filter_by(event_id=event_id).delete()
         db.session.delete(event)
         db.session.commit()
+        bump_versions('events', 'attendees')
         flash('Event and associated attendees deleted successfully!', 'success')
     except Exception as e:
         db.session.rollback()
@@ -266,11 +1416,12 @@ def add_user():
     if request.method == 'POST':
         username = request.form['username']
         email = request.form['email']
-        password = generate_password_hash(request.form['password'], method='pbkdf2:sha256')
+        password = hash_password(request.form['password'])
         new_user = User(username=username, email=email, password_hash=password)
         try:
             db.session.add(new_user)
             db.session.commit()
+            bump_versions('users')
             flash('User added successfully!', 'success')
             return redirect(url_for('users'))
         except Exception as e:
@@ -285,9 +1436,15 @@ def update_user(user_id):
     if request.method == 'POST':
         user.username = request.form['username']
         user.email = request.form['email']
+        old_id = user.get_id()
         if request.form['password']:
-            user.password_hash = generate_password_hash(request.form['password'], method='pbkdf2:sha256')
+            user.password_hash = hash_password(request.form['password'])
+            user.password_version = User.password_version + 1
         db.session.commit()
+        user_cache.pop(old_id)
+        if current_user.user_id == user.user_id:
+            login_user(user)
+        bump_versions('users')
         flash('User updated successfully!', 'success')
         return redirect(url_for('users'))
     return render_template('update_user.html', user=user)
@@ -296,8 +1453,14 @@ def update_user(user_id):
 @login_required
 def delete_user(user_id):
     user = User.query.get_or_404(user_id)
+    release_user_seats(user.user_id)
+    adjust_folded_users(User.user_id == user.user_id, sign=-1)
+    adjust_folded_events(Event.user_id == user.user_id, sign=-1)
+    old_id = user.get_id()
     db.session.delete(user)
     db.session.commit()
+    user_cache.pop(old_id)
+    bump_versions('users', 'events', 'attendees')
     flash('User deleted successfully!', 'success')
     return redirect(url_for('users'))
 
@@ -306,68 +1469,208 @@ def delete_user(user_id):
 def visualizations():
     return render_template('visualizations.html')
 
+def analytics_response(name, compute, tables):
+    # Results only change when their input tables do, so the table versions key
+    # both the per-process cache and the ETag the browser revalidates with.
+    live = use_live_analytics()
+    if not live:
+        tables = tables + ('rollups',)
+    key = (name, live, read_versions(tables))
+    if 'attendees' in tables:
+        # Registrations leave the versions alone, so results that count them
+        # are only reused within one refresh interval.
+        key += (int(time.time() // max(app.config['ROLLUP_REFRESH_SECONDS'], 1)),)
+    etag = hashlib.sha1(repr(key).encode()).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        data = analytics_cache.get(key)
+        if data is None:
+            data = compute(live)
+            analytics_cache.put(key, data)
+        response = jsonify(data)
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+# The dashboard needs two round trips for its seven datasets: one UNION ALL
+# of the four (label, value) chart series (chart_series, like
+# event_facet_counts) and one aggregate over events per title that three
+# datasets share (attendee_totals). The single-dataset endpoints below run
+# the same queries on their own.
+
+def chart_series(selects):
+    # Rows of several (label, value) series in one round trip, labels as text.
+    def branch(name, select):
+        return db.select(db.literal(name).label('series'), *select.subquery().c)
+    union = db.union_all(*[branch(name, select) for name, select in selects.items()])
+    rows = {name: [] for name in selects}
+    for name, label, value in db.session.execute(union):
+        rows[name].append((label, value))
+    return rows
+
+def user_registration_trends_series(live):
+    if live:
+        month = db.cast(db.func.date_trunc('month', User.created_at), db.String)
+        return db.select(month.label('label'), db.func.count(User.user_id).label('value')).group_by(month)
+    # Daily rows are few (one per day of history); rolled up to months below.
+    return db.select(db.cast(SignupRollup.day, db.String).label('label'), SignupRollup.total.label('value')) \
+        .where(SignupRollup.total > 0)
+
+def user_registration_trends_data(live, rows=None):
+    if rows is None:
+        rows = chart_series({'series': user_registration_trends_series(live)})['series']
+    monthly = {}
+    for label, count in rows:
+        monthly[label[:7]] = monthly.get(label[:7], 0) + count
+    user_registration_trends = sorted(monthly.items())
+    data = {
+        "labels": [month for month, _ in user_registration_trends],
+        "values": [count for _, count in user_registration_trends]
+    }
+    return data
+
 @app.route('/api/user_registration_trends')
 def api_user_registration_trends():
-    user_registration_trends = db.session.query(db.func.date_trunc('month', User.created_at).label('month'), db.func.count(User.user_id)).group_by('month').order_by('month').all()
+    return analytics_response('user_registration_trends', user_registration_trends_data, ('users',))
+
+def attendee_totals(live):
+    # (title, attendees, events with attendees) per event title, most attended first.
+    if live:
+        return db.session.query(Event.title, db.func.count(Attendee.attendee_id), db.func.count(db.distinct(Event.event_id))) \
+            .join(Attendee).group_by(Event.title).order_by(db.func.count(Attendee.attendee_id).desc()).all()
+    return db.session.query(Event.title, db.func.sum(Event.attendee_count), db.func.count(Event.event_id)) \
+        .filter(Event.attendee_count > 0).group_by(Event.title).order_by(db.func.sum(Event.attendee_count).desc()).all()
+
+def event_popularity_data(live, totals=None):
+    if totals is None:
+        totals = attendee_totals(live)
     data = {
-        "labels": [month.strftime('%Y-%m') for month, _ in user_registration_trends],
-        "values": [count for _, count in user_registration_trends]
+        "labels": [title for title, _, _ in totals],
+        "values": [count for _, count, _ in totals]
     }
-    return jsonify(data)
+    return data
 
 @app.route('/api/event_popularity')
 def api_event_popularity():
-    event_popularity = db.session.query(Event.title, db.func.count(Attendee.attendee_id)).join(Attendee).group_by(Event.title).order_by(db.func.count(Attendee.attendee_id).desc()).all()
+    return analytics_response('event_popularity', event_popularity_data, ('events', 'attendees'))
+
+def events_per_venue_series(live):
+    if live:
+        return db.select(Venue.name.label('label'), db.func.count(Event.event_id).label('value')) \
+            .join(Event).group_by(Venue.name)
+    return db.select(Venue.name.label('label'), db.func.sum(VenueEventRollup.total).label('value')) \
+        .join(VenueEventRollup).where(VenueEventRollup.total > 0).group_by(Venue.name)
+
+def events_per_venue_data(live, rows=None):
+    if rows is None:
+        rows = chart_series({'series': events_per_venue_series(live)})['series']
     data = {
-        "labels": [title for title, _ in event_popularity],
-        "values": [count for _, count in event_popularity]
+        "labels": [name for name, _ in rows],
+        "values": [count for _, count in rows]
     }
-    return jsonify(data)
+    return data
 
 @app.route('/api/events_per_venue')
 def api_events_per_venue():
-    events_per_venue = db.session.query(Venue.name, db.func.count(Event.event_id)).join(Event).group_by(Venue.name).all()
+    return analytics_response('events_per_venue', events_per_venue_data, ('venues', 'events'))
+
+def attendees_per_event_data(live, totals=None):
+    if totals is None:
+        totals = attendee_totals(live)
     data = {
-        "labels": [name for name, _ in events_per_venue],
-        "values": [count for _, count in events_per_venue]
+        "labels": [title for title, _, _ in totals],
+        "values": [count for _, count, _ in totals]
     }
-    return jsonify(data)
+    return data
 
 @app.route('/api/attendees_per_event')
 def api_attendees_per_event():
-    attendees_per_event = db.session.query(Event.title, db.func.count(Attendee.attendee_id)).join(Attendee).group_by(Event.title).all()
+    return analytics_response('attendees_per_event', attendees_per_event_data, ('events', 'attendees'))
+
+def event_dates_distribution_series(live):
+    if live:
+        day = db.cast(db.func.date(Event.event_date), db.String)
+        return db.select(day.label('label'), db.func.count(Event.event_id).label('value')).group_by(day)
+    return db.select(db.cast(EventDateRollup.day, db.String).label('label'), EventDateRollup.total.label('value')) \
+        .where(EventDateRollup.total > 0)
+
+def event_dates_distribution_data(live, rows=None):
+    if rows is None:
+        rows = chart_series({'series': event_dates_distribution_series(live)})['series']
+    event_dates_distribution = sorted(rows)
     data = {
-        "labels": [title for title, _ in attendees_per_event],
-        "values": [count for _, count in attendees_per_event]
+        "labels": [date[:10] for date, _ in event_dates_distribution],
+        "values": [count for _, count in event_dates_distribution]
     }
-    return jsonify(data)
+    return data
 
 @app.route('/api/event_dates_distribution')
 def api_event_dates_distribution():
-    event_dates_distribution = db.session.query(db.func.date(Event.event_date).label('date'), db.func.count(Event.event_id)).group_by('date').order_by('date').all()
+    return analytics_response('event_dates_distribution', event_dates_distribution_data, ('events',))
+
+def events_per_user_series(live):
+    if live:
+        return db.select(User.username.label('label'), db.func.count(Event.event_id).label('value')) \
+            .join(Event).group_by(User.username)
+    return db.select(User.username.label('label'), UserEventRollup.total.label('value')) \
+        .join(UserEventRollup).where(UserEventRollup.total > 0)
+
+def events_per_user_data(live, rows=None):
+    if rows is None:
+        rows = chart_series({'series': events_per_user_series(live)})['series']
+    events_per_user = sorted(rows)
     data = {
-        "labels": [date.strftime('%Y-%m-%d') for date, _ in event_dates_distribution],
-        "values": [count for _, count in event_dates_distribution]
+        "labels": [username for username, _ in events_per_user],
+        "values": [count for _, count in events_per_user]
     }
-    return jsonify(data)
+    return data
 
 @app.route('/api/events_per_user')
 def api_events_per_user():
-    events_per_user = db.session.query(User.username, db.func.count(Event.event_id)).join(Event).group_by(User.username).order_by(User.username).all()
+    return analytics_response('events_per_user', events_per_user_data, ('users', 'events'))
+
+def average_attendees_data(live, totals=None):
+    if totals is None:
+        totals = attendee_totals(live)
+    attendees = sum(count for _, count, _ in totals)
+    events = sum(registered for _, _, registered in totals)
     data = {
-        "labels": [username for username, _ in events_per_user],
-        "values": [count for _, count in events_per_user]
+        "value": round(attendees / events, 2) if events else 0
     }
-    return jsonify(data)
+    return data
 
 @app.route('/api/average_attendees')
 def api_average_attendees():
-    subquery = db.session.query(Event.event_id, db.func.count(Attendee.attendee_id).label('attendee_count')).join(Attendee).group_by(Event.event_id).subquery()
-    average_attendees = db.session.query(db.func.avg(subquery.c.attendee_count)).scalar()
-    data = {
-        "value": round(average_attendees, 2)
-    }
-    return jsonify(data)
+    return analytics_response('average_attendees', average_attendees_data, ('events', 'attendees'))
+
+ANALYTICS_DATASETS = {
+    'user_registration_trends': user_registration_trends_data,
+    'event_popularity': event_popularity_data,
+    'events_per_venue': events_per_venue_data,
+    'attendees_per_event': attendees_per_event_data,
+    'event_dates_distribution': event_dates_distribution_data,
+    'events_per_user': events_per_user_data,
+    'average_attendees': average_attendees_data,
+}
+
+CHART_SERIES = {
+    'user_registration_trends': user_registration_trends_series,
+    'events_per_venue': events_per_venue_series,
+    'event_dates_distribution': event_dates_distribution_series,
+    'events_per_user': events_per_user_series,
+}
+
+def dashboard_data(live):
+    rows = chart_series({name: series(live) for name, series in CHART_SERIES.items()})
+    totals = attendee_totals(live)
+    return {name: dataset(live, rows.get(name, totals)) for name, dataset in ANALYTICS_DATASETS.items()}
+
+@app.route('/api/dashboard')
+def api_dashboard():
+    # Every chart in one response: one Flask-Login load, one pool checkout and
+    # two aggregate queries (see chart_series).
+    return analytics_response('dashboard', dashboard_data, ('users', 'venues', 'events', 'attendees'))
 
 if __name__ == '__main__':
     with app.app_context():
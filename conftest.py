@@ -0,0 +1,7 @@
+import os
+import tempfile
+
+# The app binds its engine at import time, so point it at a scratch SQLite file
+# before any test module imports it.
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'tests.db')
+os.environ.setdefault('PBKDF2_ITERATIONS', '1000')
@@ -0,0 +1,24 @@
+import os
+import shutil
+import tempfile
+
+# Picked up automatically by `gunicorn app:app` (see Procfile).
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+# Threaded workers: while one thread waits on password hashing (which runs
+# in the app's bounded executor and releases the GIL) the others keep serving.
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Every worker writes its Prometheus samples here and /metrics merges them.
+# It has to be in the environment before the workers import the app.
+prometheus_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR',
+                                       os.path.join(tempfile.gettempdir(), 'ems_prometheus'))
+
+def on_starting(server):
+    # Samples left by a previous master would be merged into this one's.
+    shutil.rmtree(prometheus_dir, ignore_errors=True)
+    os.makedirs(prometheus_dir)
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
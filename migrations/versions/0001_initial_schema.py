@@ -0,0 +1,65 @@
+"""Initial schema: users, venues, events and attendees
+
+Revision ID: 0001
+Revises:
+Create Date: 2024-07-20 10:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('users',
+        sa.Column('user_id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('username', sa.String(length=50), nullable=False),
+        sa.Column('password_hash', sa.String(length=128), nullable=False),
+        sa.Column('email', sa.String(length=100), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('user_id'),
+        sa.UniqueConstraint('email'),
+        sa.UniqueConstraint('username')
+    )
+    op.create_table('venues',
+        sa.Column('venue_id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('location', sa.String(length=255), nullable=True),
+        sa.Column('capacity', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('venue_id')
+    )
+    op.create_table('events',
+        sa.Column('event_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('venue_id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=100), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('event_date', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['venue_id'], ['venues.venue_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('event_id')
+    )
+    op.create_table('attendees',
+        sa.Column('attendee_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('event_id', sa.Integer(), nullable=False),
+        sa.Column('registration_date', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['event_id'], ['events.event_id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('attendee_id')
+    )
+
+
+def downgrade():
+    op.drop_table('attendees')
+    op.drop_table('events')
+    op.drop_table('venues')
+    op.drop_table('users')
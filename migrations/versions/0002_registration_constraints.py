@@ -0,0 +1,64 @@
+"""Unique registrations and the events.attendee_count seat counter
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2024-07-27 10:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+# Events recounted per transaction by the attendee_count backfill.
+BATCH_SIZE = 1000
+
+
+def upgrade():
+    dialect = op.get_context().dialect.name
+    # Keep the earliest of any duplicate registrations before enforcing uniqueness.
+    op.execute('DELETE FROM attendees WHERE attendee_id NOT IN '
+               '(SELECT MIN(attendee_id) FROM attendees GROUP BY user_id, event_id)')
+    if dialect == 'postgresql':
+        # Build the index without blocking registrations, then attach it as the
+        # constraint, which only takes a brief lock.
+        with op.get_context().autocommit_block():
+            op.create_index('uq_attendees_user_id_event_id', 'attendees', ['user_id', 'event_id'], unique=True,
+                            postgresql_concurrently=True, if_not_exists=True)
+        op.execute('ALTER TABLE attendees ADD CONSTRAINT uq_attendees_user_id_event_id '
+                   'UNIQUE USING INDEX uq_attendees_user_id_event_id')
+    else:
+        with op.batch_alter_table('attendees') as batch_op:
+            batch_op.create_unique_constraint('uq_attendees_user_id_event_id', ['user_id', 'event_id'])
+    with op.batch_alter_table('events') as batch_op:
+        batch_op.add_column(sa.Column('attendee_count', sa.Integer(), server_default='0', nullable=False))
+    # Counted in primary-key batches, each its own transaction, like the
+    # reconcile-attendee-counts command, so no single statement locks every event.
+    bind = op.get_bind()
+    with op.get_context().autocommit_block():
+        last_id = 0
+        while True:
+            batch_end = bind.execute(sa.text('SELECT max(event_id) FROM (SELECT event_id FROM events WHERE event_id > :after '
+                                             'ORDER BY event_id LIMIT :size) AS batch'),
+                                     {'after': last_id, 'size': BATCH_SIZE}).scalar()
+            if batch_end is None:
+                break
+            bind.execute(sa.text('UPDATE events SET attendee_count = counted.total '
+                                 'FROM (SELECT event_id, COUNT(*) AS total FROM attendees '
+                                 'WHERE event_id > :after AND event_id <= :end GROUP BY event_id) AS counted '
+                                 'WHERE events.event_id = counted.event_id'),
+                         {'after': last_id, 'end': batch_end})
+            last_id = batch_end
+
+
+def downgrade():
+    with op.batch_alter_table('events') as batch_op:
+        batch_op.drop_column('attendee_count')
+    with op.batch_alter_table('attendees') as batch_op:
+        batch_op.drop_constraint('uq_attendees_user_id_event_id', type_='unique')
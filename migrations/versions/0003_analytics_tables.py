@@ -0,0 +1,60 @@
+"""Analytics rollup tables and table version counters
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2024-08-03 10:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('rollup_signups_daily',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('day')
+    )
+    op.create_table('rollup_events_daily',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('day')
+    )
+    op.create_table('rollup_events_per_venue',
+        sa.Column('venue_id', sa.Integer(), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['venue_id'], ['venues.venue_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('venue_id')
+    )
+    op.create_table('rollup_events_per_user',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table('rollup_watermarks',
+        sa.Column('source', sa.String(length=50), nullable=False),
+        sa.Column('last_id', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('source')
+    )
+    op.create_table('table_versions',
+        sa.Column('table_name', sa.String(length=50), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('table_name')
+    )
+
+
+def downgrade():
+    op.drop_table('table_versions')
+    op.drop_table('rollup_watermarks')
+    op.drop_table('rollup_events_per_user')
+    op.drop_table('rollup_events_per_venue')
+    op.drop_table('rollup_events_daily')
+    op.drop_table('rollup_signups_daily')
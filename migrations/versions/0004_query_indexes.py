@@ -0,0 +1,40 @@
+"""Indexes for the listing, analytics and cascade query patterns
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2024-08-10 10:00:00
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+# users.created_at, events.event_date and attendees.user_id are served by the
+# leading column of the keyset indexes and the unique registration constraint.
+INDEXES = [
+    ('ix_users_created_at_user_id', 'users', ['created_at', 'user_id']),
+    ('ix_venues_name_venue_id', 'venues', ['name', 'venue_id']),
+    ('ix_events_event_date_event_id', 'events', ['event_date', 'event_id']),
+    ('ix_events_venue_id', 'events', ['venue_id']),
+    ('ix_events_user_id', 'events', ['user_id']),
+    ('ix_attendees_event_id', 'attendees', ['event_id']),
+]
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction, and builds
+    # without blocking writes to large production tables.
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,43 @@
+"""BRIN time-range indexes on attendees.registration_date and events.event_date
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2024-08-17 10:00:00
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+# Both tables are appended in roughly time order, so a BRIN index of a few
+# pages prunes "recent registrations" and date-window scans almost as well as
+# monthly partitions would, without giving up the unique (user_id, event_id)
+# constraint or the attendees -> events foreign key that partitioning breaks.
+# autosummarize keeps newly filled block ranges indexed in the background.
+INDEXES = [
+    ('brin_attendees_registration_date', 'attendees', ['registration_date']),
+    ('brin_events_event_date', 'events', ['event_date']),
+]
+
+
+def upgrade():
+    if op.get_context().dialect.name != 'postgresql':
+        return
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_using='brin',
+                            postgresql_with={'autosummarize': 'on'},
+                            postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade():
+    if op.get_context().dialect.name != 'postgresql':
+        return
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
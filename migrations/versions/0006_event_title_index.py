@@ -0,0 +1,25 @@
+"""Index events.title for natural-key resolution during bulk loads
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2024-08-24 10:00:00
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index('ix_events_title', 'events', ['title'], postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_events_title', table_name='events', postgresql_concurrently=True, if_exists=True)
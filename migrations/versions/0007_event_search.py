@@ -0,0 +1,59 @@
+"""Full-text search on events.title and events.description
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2024-08-31 10:00:00
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+# PostgreSQL: a stored generated tsvector (title weighted above description)
+# with a GIN index. Adding the column rewrites events once; the index is then
+# built without blocking writes.
+SEARCH_VECTOR = ("ALTER TABLE events ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS "
+                 "(setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+                 "setweight(to_tsvector('english', coalesce(description, '')), 'B')) STORED")
+
+# SQLite: an external-content FTS5 index over the same columns, kept in sync
+# by triggers and filled from the existing rows.
+SQLITE_FTS = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(title, description, content='events', content_rowid='event_id')",
+    "CREATE TRIGGER IF NOT EXISTS events_fts_insert AFTER INSERT ON events BEGIN "
+    "INSERT INTO events_fts(rowid, title, description) VALUES (new.event_id, new.title, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS events_fts_delete AFTER DELETE ON events BEGIN "
+    "INSERT INTO events_fts(events_fts, rowid, title, description) VALUES ('delete', old.event_id, old.title, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS events_fts_update AFTER UPDATE OF title, description ON events BEGIN "
+    "INSERT INTO events_fts(events_fts, rowid, title, description) VALUES ('delete', old.event_id, old.title, old.description); "
+    "INSERT INTO events_fts(rowid, title, description) VALUES (new.event_id, new.title, new.description); END",
+    "INSERT INTO events_fts(events_fts) VALUES ('rebuild')",
+]
+
+
+def upgrade():
+    dialect = op.get_context().dialect.name
+    if dialect == 'postgresql':
+        op.execute(SEARCH_VECTOR)
+        with op.get_context().autocommit_block():
+            op.execute('CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_events_search_vector ON events USING gin (search_vector)')
+    elif dialect == 'sqlite':
+        for statement in SQLITE_FTS:
+            op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_context().dialect.name
+    if dialect == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.execute('DROP INDEX CONCURRENTLY IF EXISTS ix_events_search_vector')
+        op.execute('ALTER TABLE events DROP COLUMN IF EXISTS search_vector')
+    elif dialect == 'sqlite':
+        for trigger in ('events_fts_update', 'events_fts_delete', 'events_fts_insert'):
+            op.execute('DROP TRIGGER IF EXISTS %s' % trigger)
+        op.execute('DROP TABLE IF EXISTS events_fts')
@@ -0,0 +1,38 @@
+"""Composite indexes for the filtered /events listing and its facet counts
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2024-09-07 10:00:00
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+# (venue_id | user_id, event_date, event_id) serves a venue or organizer filter
+# walked in keyset order, a month range within it, and the per-venue and
+# per-organizer facet counts. They supersede the single-column indexes from
+# 0004, which are dropped once the wider ones exist.
+REPLACEMENTS = [
+    ('ix_events_venue_id_event_date', ['venue_id', 'event_date', 'event_id'], 'ix_events_venue_id', ['venue_id']),
+    ('ix_events_user_id_event_date', ['user_id', 'event_date', 'event_id'], 'ix_events_user_id', ['user_id']),
+]
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, columns, old_name, _ in REPLACEMENTS:
+            op.create_index(name, 'events', columns, postgresql_concurrently=True, if_not_exists=True)
+            op.drop_index(old_name, table_name='events', postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, _, old_name, old_columns in reversed(REPLACEMENTS):
+            op.create_index(old_name, 'events', old_columns, postgresql_concurrently=True, if_not_exists=True)
+            op.drop_index(name, table_name='events', postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,29 @@
+"""Latitude and longitude on venues
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2024-09-14 10:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Nullable columns without defaults: a catalog-only change, no rewrite.
+    with op.batch_alter_table('venues') as batch_op:
+        batch_op.add_column(sa.Column('latitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('longitude', sa.Float(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('venues') as batch_op:
+        batch_op.drop_column('longitude')
+        batch_op.drop_column('latitude')
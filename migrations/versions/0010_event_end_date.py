@@ -0,0 +1,69 @@
+"""End time on events and no overlapping bookings per venue
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2024-09-21 10:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+# Existing events get two hours (DEFAULT_EVENT_DURATION), cut short at the
+# next booking of the same venue. Events that were double-booked at the same
+# start end where they begin: kept, but zero-length, so they block nothing.
+BACKFILL = {
+    'postgresql': "UPDATE events SET end_date = LEAST(events.event_date + interval '2 hours', successor.start) "
+                  "FROM (SELECT event_id, lead(event_date) OVER (PARTITION BY venue_id ORDER BY event_date, event_id) "
+                  "AS start FROM events) AS successor WHERE successor.event_id = events.event_id",
+    # Same format as the stored timestamps, which keep their microseconds.
+    'sqlite': "UPDATE events SET end_date = CASE WHEN successor.start < successor.shifted THEN successor.start ELSE successor.shifted END "
+              "FROM (SELECT event_id, lead(event_date) OVER (PARTITION BY venue_id ORDER BY event_date, event_id) AS start, "
+              "strftime('%Y-%m-%d %H:%M:%S', event_date, '+2 hours') || substr(event_date, 20) AS shifted "
+              "FROM events) AS successor WHERE successor.event_id = events.event_id",
+}
+
+EXCLUSION = ("ALTER TABLE events ADD CONSTRAINT ex_events_venue_id_during EXCLUDE USING gist "
+             "(venue_id WITH =, tsrange(event_date, end_date) WITH &&) DEFERRABLE INITIALLY DEFERRED")
+
+
+def upgrade():
+    dialect = op.get_context().dialect.name
+    with op.batch_alter_table('events') as batch_op:
+        batch_op.add_column(sa.Column('end_date', sa.DateTime(), nullable=True))
+    op.execute(BACKFILL[dialect])
+    # On SQLite the batch below rebuilds the table, which drops its triggers
+    # (the full-text index's, from 0007); they are put back afterwards.
+    triggers = []
+    if dialect == 'sqlite':
+        triggers = [sql for sql, in op.get_bind().execute(
+            sa.text("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'events'"))]
+    with op.batch_alter_table('events') as batch_op:
+        batch_op.alter_column('end_date', existing_type=sa.DateTime(), nullable=False)
+        batch_op.create_check_constraint('ck_events_end_date', 'end_date >= event_date')
+    for sql in triggers:
+        op.execute(sql)
+    if dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        op.execute(EXCLUSION)
+
+
+def downgrade():
+    dialect = op.get_context().dialect.name
+    if dialect == 'postgresql':
+        op.execute('ALTER TABLE events DROP CONSTRAINT IF EXISTS ex_events_venue_id_during')
+    triggers = []
+    if dialect == 'sqlite':
+        triggers = [sql for sql, in op.get_bind().execute(
+            sa.text("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'events'"))]
+    with op.batch_alter_table('events') as batch_op:
+        batch_op.drop_constraint('ck_events_end_date', type_='check')
+        batch_op.drop_column('end_date')
+    for sql in triggers:
+        op.execute(sql)
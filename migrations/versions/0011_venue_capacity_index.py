@@ -0,0 +1,26 @@
+"""Index venues.capacity for the venue availability search
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2024-09-28 10:00:00
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0011'
+down_revision = '0010'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index('ix_venues_capacity_venue_id', 'venues', ['capacity', 'venue_id'],
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_venues_capacity_venue_id', table_name='venues', postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,27 @@
+"""Password version on users for the session fingerprint
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2024-10-05 10:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0012'
+down_revision = '0011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # A constant default: a catalog-only change on PostgreSQL, no rewrite.
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.add_column(sa.Column('password_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('password_version')
@@ -0,0 +1,32 @@
+"""Venue location change log for the geo index
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2024-10-12 10:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0013'
+down_revision = '0012'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('venue_changes',
+        sa.Column('version', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('venue_id', sa.Integer(), nullable=False),
+        sa.Column('old_latitude', sa.Float(), nullable=True),
+        sa.Column('old_longitude', sa.Float(), nullable=True),
+        sa.Column('new_latitude', sa.Float(), nullable=True),
+        sa.Column('new_longitude', sa.Float(), nullable=True),
+        sa.PrimaryKeyConstraint('version')
+    )
+
+
+def downgrade():
+    op.drop_table('venue_changes')
@@ -0,0 +1,30 @@
+"""Index venues by seats, counting an unset capacity as unlimited
+
+Revision ID: 0014
+Revises: 0013
+Create Date: 2024-10-19 10:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0014'
+down_revision = '0013'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index('ix_venues_seats_venue_id', 'venues', [sa.text('coalesce(capacity, 2147483647)'), 'venue_id'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.drop_index('ix_venues_capacity_venue_id', table_name='venues', postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index('ix_venues_capacity_venue_id', 'venues', ['capacity', 'venue_id'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.drop_index('ix_venues_seats_venue_id', table_name='venues', postgresql_concurrently=True, if_exists=True)
@@ -12,7 +12,9 @@ class User(db.Model):
     password_hash = db.Column(db.String(128), nullable=False)
     email = db.Column(db.String(100), unique=True, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    password_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     events = db.relationship('Event', backref='user', passive_deletes=True)
+    __table_args__ = (db.Index('ix_users_created_at_user_id', 'created_at', 'user_id'),)
 
 class Venue(db.Model):
     __tablename__ = 'venues'
@@ -20,8 +22,14 @@ class Venue(db.Model):
     name = db.Column(db.String(100), nullable=False)
     location = db.Column(db.String(255))
     capacity = db.Column(db.Integer)
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     events = db.relationship('Event', backref='venue', passive_deletes=True)
+    __table_args__ = (db.Index('ix_venues_name_venue_id', 'name', 'venue_id'),)
+
+UNLIMITED_SEATS = 2 ** 31 - 1
+db.Index('ix_venues_seats_venue_id', db.func.coalesce(Venue.capacity, db.literal_column(str(UNLIMITED_SEATS))), Venue.venue_id)
 
 class Event(db.Model):
     __tablename__ = 'events'
@@ -31,8 +39,15 @@ class Event(db.Model):
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
     event_date = db.Column(db.DateTime, nullable=False)
+    end_date = db.Column(db.DateTime, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    attendee_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     attendees = db.relationship('Attendee', backref='event', passive_deletes=True)
+    __table_args__ = (db.Index('ix_events_event_date_event_id', 'event_date', 'event_id'),
+                      db.Index('ix_events_venue_id_event_date', 'venue_id', 'event_date', 'event_id'),
+                      db.Index('ix_events_user_id_event_date', 'user_id', 'event_date', 'event_id'),
+                      db.Index('ix_events_title', 'title'),
+                      db.CheckConstraint('end_date >= event_date', name='ck_events_end_date'))
 
 class Attendee(db.Model):
     __tablename__ = 'attendees'
@@ -40,3 +55,5 @@ class Attendee(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.user_id', ondelete='CASCADE'), nullable=False)
     event_id = db.Column(db.Integer, db.ForeignKey('events.event_id', ondelete='CASCADE'), nullable=False)
     registration_date = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (db.UniqueConstraint('user_id', 'event_id', name='uq_attendees_user_id_event_id'),
+                      db.Index('ix_attendees_event_id', 'event_id'))
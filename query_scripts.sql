@@ -19,3 +19,15 @@ SELECT setval('users_user_id_seq', (SELECT MAX(user_id) FROM users));
 SELECT setval('events_event_id_seq', (SELECT MAX(event_id) FROM events));
 
 
+
+-- Remove duplicate registrations, keeping the earliest, then enforce uniqueness.
+DELETE FROM attendees a
+USING attendees b
+WHERE a.user_id = b.user_id AND a.event_id = b.event_id AND a.attendee_id > b.attendee_id;
+
+ALTER TABLE attendees ADD CONSTRAINT uq_attendees_user_id_event_id UNIQUE (user_id, event_id);
+
+-- Seat counter used to enforce venue capacity on registration.
+ALTER TABLE events ADD COLUMN attendee_count INT NOT NULL DEFAULT 0;
+
+-- Backfill it with `flask reconcile-attendee-counts`, which recounts in batches.
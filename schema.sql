@@ -4,7 +4,8 @@ CREATE TABLE users (
     username VARCHAR(50) UNIQUE NOT NULL,
     password_hash VARCHAR(128) NOT NULL,
     email VARCHAR(100) UNIQUE NOT NULL,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    password_version INT NOT NULL DEFAULT 0
 );
 
 CREATE TABLE venues (
@@ -12,6 +13,8 @@ CREATE TABLE venues (
     name VARCHAR(100) NOT NULL,
     location VARCHAR(255),
     capacity INT,
+    latitude DOUBLE PRECISION,
+    longitude DOUBLE PRECISION,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -22,12 +25,77 @@ CREATE TABLE events (
     title VARCHAR(100) NOT NULL,
     description TEXT,
     event_date TIMESTAMP NOT NULL,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    end_date TIMESTAMP NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    attendee_count INT NOT NULL DEFAULT 0,
+    CONSTRAINT ck_events_end_date CHECK (end_date >= event_date)
 );
 
 CREATE TABLE attendees (
     attendee_id SERIAL PRIMARY KEY,
     user_id INT REFERENCES users(user_id),
     event_id INT REFERENCES events(event_id),
-    registration_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    registration_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uq_attendees_user_id_event_id UNIQUE (user_id, event_id)
+);
+
+CREATE TABLE rollup_signups_daily (
+    day DATE PRIMARY KEY,
+    total INT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE rollup_events_daily (
+    day DATE PRIMARY KEY,
+    total INT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE rollup_events_per_venue (
+    venue_id INT PRIMARY KEY REFERENCES venues(venue_id) ON DELETE CASCADE,
+    total INT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE rollup_events_per_user (
+    user_id INT PRIMARY KEY REFERENCES users(user_id) ON DELETE CASCADE,
+    total INT NOT NULL DEFAULT 0
 );
+
+CREATE TABLE rollup_watermarks (
+    source VARCHAR(50) PRIMARY KEY,
+    last_id INT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE table_versions (
+    table_name VARCHAR(50) PRIMARY KEY,
+    version INT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE venue_changes (
+    version INT PRIMARY KEY,
+    venue_id INT NOT NULL,
+    old_latitude DOUBLE PRECISION,
+    old_longitude DOUBLE PRECISION,
+    new_latitude DOUBLE PRECISION,
+    new_longitude DOUBLE PRECISION
+);
+
+CREATE INDEX ix_users_created_at_user_id ON users (created_at, user_id);
+CREATE INDEX ix_venues_name_venue_id ON venues (name, venue_id);
+CREATE INDEX ix_venues_seats_venue_id ON venues (coalesce(capacity, 2147483647), venue_id);
+CREATE INDEX ix_events_event_date_event_id ON events (event_date, event_id);
+CREATE INDEX ix_events_venue_id_event_date ON events (venue_id, event_date, event_id);
+CREATE INDEX ix_events_user_id_event_date ON events (user_id, event_date, event_id);
+CREATE INDEX ix_attendees_event_id ON attendees (event_id);
+CREATE INDEX brin_attendees_registration_date ON attendees USING brin (registration_date) WITH (autosummarize = on);
+CREATE INDEX brin_events_event_date ON events USING brin (event_date) WITH (autosummarize = on);
+CREATE INDEX ix_events_title ON events (title);
+
+-- Full-text search on events (PostgreSQL)
+ALTER TABLE events ADD COLUMN search_vector tsvector GENERATED ALWAYS AS
+    (setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+     setweight(to_tsvector('english', coalesce(description, '')), 'B')) STORED;
+CREATE INDEX ix_events_search_vector ON events USING gin (search_vector);
+
+-- No two bookings of a venue overlap (PostgreSQL, checked at commit)
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+ALTER TABLE events ADD CONSTRAINT ex_events_venue_id_during EXCLUDE USING gist
+    (venue_id WITH =, tsrange(event_date, end_date) WITH &&) DEFERRABLE INITIALLY DEFERRED;
@@ -0,0 +1,138 @@
+import sys
+import os
+import argparse
+import json
+import random
+import time
+from datetime import timedelta
+from itertools import islice
+
+# Ensure the parent directory is in the system path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app, db, Event, VenueGeoIndex, haversine_km, venue_geo_index
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return round(samples[min(len(samples) - 1, int(len(samples) * fraction))], 3) if samples else None
+
+def timed(fn, runs):
+    latencies = []
+    for i in range(runs):
+        start = time.perf_counter()
+        fn(i)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {'runs': runs, 'p50_ms': percentile(latencies, 0.50), 'p95_ms': percentile(latencies, 0.95),
+            'max_ms': percentile(latencies, 1.0)}
+
+def synthetic_venues(count, cities, seed):
+    # Most venues cluster around city centres, the rest are scattered anywhere.
+    rng = random.Random(seed)
+    centres = [(rng.uniform(-45, 60), rng.uniform(-180, 180)) for _ in range(cities)]
+    for venue_id in range(1, count + 1):
+        if rng.random() < 0.9:
+            lat, lng = rng.choice(centres)
+            yield venue_id, max(-90.0, min(90.0, lat + rng.gauss(0, 0.2))), (lng + rng.gauss(0, 0.2) + 180) % 360 - 180
+        else:
+            yield venue_id, rng.uniform(-90, 90), rng.uniform(-180, 180)
+
+def brute_force(points, lat, lng, n=None, radius_km=None):
+    distances = sorted((haversine_km(lat, lng, venue_lat, venue_lng), venue_id) for venue_id, venue_lat, venue_lng in points)
+    if radius_km is not None:
+        distances = [d for d in distances if d[0] <= radius_km]
+    return distances[:n] if n is not None else distances
+
+def bench_index(args):
+    points = list(synthetic_venues(args.venues, args.cities, args.seed))
+    rng = random.Random(args.seed + 1)
+    queries = [(lat + rng.gauss(0, 0.1), lng + rng.gauss(0, 0.1)) for _, lat, lng in rng.sample(points, args.queries)]
+    index = VenueGeoIndex(args.cell_degrees)
+    start = time.perf_counter()
+    index.load(points, version=0)
+    report = {'venues': args.venues, 'cell_degrees': index.cell, 'cells': len(index.cells),
+              'build_seconds': round(time.perf_counter() - start, 2),
+              'index_mb': round(sum(column.itemsize * len(column) for entry in index.cells.values() for column in entry)
+                                / 2 ** 20, 1)}
+    report['nearest_%d' % args.nearest] = timed(lambda i: list(islice(index.nearby(*queries[i]), args.nearest)), args.queries)
+    for radius in args.radius_km:
+        sizes = []
+        report['radius_%gkm' % radius] = timed(lambda i: sizes.append(len(list(index.nearby(*queries[i], radius_km=radius)))),
+                                               args.queries)
+        report['radius_%gkm' % radius]['mean_results'] = round(sum(sizes) / len(sizes), 1)
+    next_id = args.venues + 1
+    report['add_and_remove'] = timed(lambda i: (index.add(next_id + i, *queries[i]), index.remove(next_id + i, *queries[i])),
+                                     args.queries)
+    # A handful of full scans: the baseline, and a check of the index results.
+    checks = queries[:args.checks]
+    report['brute_force_nearest'] = timed(lambda i: brute_force(points, *checks[i], n=args.nearest), len(checks))
+    mismatches = 0
+    for lat, lng in checks:
+        mismatches += list(islice(index.nearby(lat, lng), args.nearest)) != brute_force(points, lat, lng, n=args.nearest)
+        radius = args.radius_km[0]
+        mismatches += list(index.nearby(lat, lng, radius_km=radius)) != brute_force(points, lat, lng, radius_km=radius)
+    report['mismatches'] = mismatches
+    return report
+
+def bench_api(args):
+    # Against the app's database (seed it with generate_workload.py): the
+    # nearby API with and without an event date window.
+    app.config['WTF_CSRF_ENABLED'] = False
+    client = app.test_client()
+    client.post('/login', data={'email': args.email, 'password': args.password})
+    with app.app_context():
+        start = time.perf_counter()
+        index = venue_geo_index()
+        load_seconds = time.perf_counter() - start
+        points = [(lat, lng) for entry in index.cells.values() for lat, lng in zip(entry[1], entry[2])]
+        first, last = db.session.query(db.func.min(Event.event_date), db.func.max(Event.event_date)).one()
+    if not points or first is None:
+        raise SystemExit('the database has no venues with coordinates or no events')
+    rng = random.Random(args.seed)
+    queries = [rng.choice(points) for _ in range(args.queries)]
+    windows = [first + timedelta(days=rng.randrange(max(1, (last - first).days))) for _ in range(args.queries)]
+    report = {'database': None, 'venues_indexed': index.size, 'index_load_seconds': round(load_seconds, 2)}
+    with app.app_context():
+        report['database'] = db.engine.dialect.name
+
+    def get(path):
+        response = client.get(path)
+        if response.status_code != 200:
+            raise RuntimeError('%s: HTTP %d' % (path, response.status_code))
+
+    report['nearest'] = timed(lambda i: get('/api/venues/nearby?lat=%f&lng=%f&limit=%d' % (*queries[i], args.nearest)),
+                              args.queries)
+    report['radius_%gkm' % args.radius_km[0]] = timed(lambda i: get('/api/venues/nearby?lat=%f&lng=%f&radius_km=%g&limit=100' % (
+        *queries[i], args.radius_km[0])), args.queries)
+    report['nearest_with_events_in_30_days'] = timed(lambda i: get(
+        '/api/venues/nearby?lat=%f&lng=%f&limit=%d&from=%s&to=%s' % (*queries[i], args.nearest, windows[i].date().isoformat(),
+                                                                     (windows[i] + timedelta(days=30)).date().isoformat())),
+        args.queries)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the venue geo index (nearest-N, radius, incremental '
+                                                 'updates) against a full scan, or with --api the nearby API on '
+                                                 'the configured database.')
+    parser.add_argument('--venues', type=int, default=1000000, help='synthetic venues to index')
+    parser.add_argument('--cities', type=int, default=200, help='city clusters the venues are spread over')
+    parser.add_argument('--cell-degrees', type=float, default=app.config['GEO_CELL_DEGREES'])
+    parser.add_argument('--queries', type=int, default=500, help='queries per measurement')
+    parser.add_argument('--checks', type=int, default=5, help='queries compared against a full scan')
+    parser.add_argument('--nearest', type=int, default=10, help='N for nearest-N queries')
+    parser.add_argument('--radius-km', type=lambda value: [float(r) for r in value.split(',')], default=[5.0, 25.0],
+                        help='comma-separated radii')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--api', action='store_true', help='time /api/venues/nearby on DATABASE_URL instead')
+    parser.add_argument('--email', default='user0000000@example.com', help='login for --api')
+    parser.add_argument('--password', default='password123')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+    output = json.dumps(bench_api(args) if args.api else bench_index(args), indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
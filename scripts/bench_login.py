@@ -0,0 +1,92 @@
+import sys
+import os
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Ensure the parent directory is in the system path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app, db, User, make_password_hash
+
+def apply_setting(setting):
+    # 'pbkdf2:<iterations>' or 'argon2:<time cost>:<memory KiB>'
+    scheme, *cost = setting.split(':')
+    app.config['PASSWORD_SCHEME'] = scheme
+    if scheme == 'argon2':
+        app.config['ARGON2_TIME_COST'], app.config['ARGON2_MEMORY_COST'] = int(cost[0]), int(cost[1])
+    else:
+        app.config['PBKDF2_ITERATIONS'] = int(cost[0])
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return round(samples[min(len(samples) - 1, int(len(samples) * fraction))], 2) if samples else None
+
+def run_setting(setting, logins, concurrency):
+    apply_setting(setting)
+    start = time.perf_counter()
+    password_hash = make_password_hash('password123')
+    hash_ms = (time.perf_counter() - start) * 1000
+    prefix = 'login%d' % int(time.time() * 1000)
+    with app.app_context():
+        db.session.execute(db.insert(User), [
+            {'username': '%s_%d' % (prefix, i), 'email': '%s_%d@example.com' % (prefix, i), 'password_hash': password_hash}
+            for i in range(logins)])
+        db.session.commit()
+
+    def login(i):
+        client = app.test_client()
+        start = time.perf_counter()
+        response = client.post('/login', data={'email': '%s_%d@example.com' % (prefix, i), 'password': 'password123'})
+        return (time.perf_counter() - start) * 1000, response.status_code == 302
+
+    # A page that does no hashing, requested throughout the burst, shows
+    # whether logins starve the rest of the app.
+    page_latencies = []
+    done = threading.Event()
+    def browse():
+        client = app.test_client()
+        while not done.is_set():
+            start = time.perf_counter()
+            client.get('/')
+            page_latencies.append((time.perf_counter() - start) * 1000)
+    browser = threading.Thread(target=browse)
+    browser.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(login, range(logins)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    browser.join()
+    latencies = [latency for latency, _ in results]
+    return {'setting': setting, 'hash_ms': round(hash_ms, 2), 'logins': logins,
+            'failed': sum(1 for _, ok in results if not ok),
+            'logins_per_s': round(logins / elapsed, 1),
+            'login_p50_ms': percentile(latencies, 0.50), 'login_p95_ms': percentile(latencies, 0.95),
+            'page_p95_ms_during_burst': percentile(page_latencies, 0.95)}
+
+def main():
+    parser = argparse.ArgumentParser(description='Login throughput and latency for each password hashing cost. '
+                                                 'Set PASSWORD_HASH_WORKERS to size the hashing pool.')
+    parser.add_argument('--settings', default='pbkdf2:100000,pbkdf2:600000,argon2:2:19456,argon2:3:65536',
+                        help="comma-separated 'pbkdf2:<iterations>' / 'argon2:<time cost>:<memory KiB>'")
+    parser.add_argument('--logins', type=int, default=50, help='logins per setting')
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent login threads')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+    app.config['WTF_CSRF_ENABLED'] = False
+    report = {'database': None, 'hash_workers': app.config['PASSWORD_HASH_WORKERS'], 'cpus': os.cpu_count(),
+              'results': [run_setting(setting, args.logins, args.concurrency) for setting in args.settings.split(',')]}
+    with app.app_context():
+        report['database'] = db.engine.dialect.name
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
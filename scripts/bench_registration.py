@@ -0,0 +1,91 @@
+import sys
+import os
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter
+
+# Ensure the parent directory is in the system path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app, db, User, Venue, Event, Attendee, register_attendee, make_password_hash
+from datetime import datetime, timedelta
+
+def create_fixture(prefix, capacity=1000, events=1):
+    user = User(username=prefix + 'organizer', email=prefix + '@example.com',
+                password_hash=make_password_hash('password123'))
+    venue = Venue(name=prefix + ' Hall', location='1 Bench Road', capacity=capacity)
+    db.session.add_all([user, venue])
+    db.session.flush()
+    new_events = [Event(user_id=user.user_id, venue_id=venue.venue_id, title='%s Event %d' % (prefix, i),
+                        description='Concurrency benchmark fixture.',
+                        event_date=datetime(2030, 1, 1, 18, 0) + timedelta(days=i))
+                  for i in range(events)]
+    db.session.add_all(new_events)
+    db.session.commit()
+    return user.user_id, [event.event_id for event in new_events]
+
+def create_users(prefix, count):
+    # One shared hash: hashing per bench user would dominate the setup time.
+    password_hash = make_password_hash('password123')
+    db.session.execute(db.insert(User), [
+        {'username': '%s_%d' % (prefix, i), 'email': '%s_%d@example.com' % (prefix, i), 'password_hash': password_hash}
+        for i in range(count)])
+    db.session.commit()
+    return [user_id for user_id, in db.session.query(User.user_id).filter(User.username.like(prefix + '\\_%', escape='\\'))]
+
+def register(user_id, event_id):
+    with app.app_context():
+        return register_attendee(user_id, event_id)
+
+def run_double_submit(requests, workers):
+    """Fire `requests` parallel registrations of one user for one event."""
+    with app.app_context():
+        user_id, (event_id,) = create_fixture('dup%d' % int(time.time() * 1000))
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = Counter(pool.map(lambda _: register(user_id, event_id), range(requests)))
+    elapsed = time.perf_counter() - start
+    with app.app_context():
+        rows = Attendee.query.filter_by(user_id=user_id, event_id=event_id).count()
+    print('double submit: %d requests in %.2fs (%.0f req/s) -> %s, %d attendee row(s)'
+          % (requests, elapsed, requests / elapsed, dict(results), rows))
+    return results['registered'] == 1 and rows == 1
+
+def run_ticket_drop(requests, workers, capacity, hot):
+    """Fire `requests` distinct users at one event (hot) or at one event each."""
+    prefix = '%s%d' % ('hot' if hot else 'spread', int(time.time() * 1000))
+    with app.app_context():
+        _, event_ids = create_fixture(prefix, capacity=capacity, events=1 if hot else requests)
+        user_ids = create_users(prefix, requests)
+    targets = [(user_id, event_ids[0] if hot else event_ids[i]) for i, user_id in enumerate(user_ids)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = Counter(pool.map(lambda target: register(*target), targets))
+    elapsed = time.perf_counter() - start
+    with app.app_context():
+        rows = Attendee.query.filter(Attendee.event_id.in_(event_ids)).count()
+        counted = db.session.query(db.func.sum(Event.attendee_count)).filter(Event.event_id.in_(event_ids)).scalar()
+    print('%s: %d requests in %.2fs (%.0f req/s) -> %s, %d attendee row(s), counter %d'
+          % ('hot event' if hot else 'spread events', requests, elapsed, requests / elapsed, dict(results), rows, counted))
+    expected = min(requests, capacity) if hot else requests
+    return results['registered'] == expected == rows == counted
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent event registration check.')
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=50)
+    parser.add_argument('--capacity', type=int, default=1000, help='seats in the hot event venue')
+    parser.add_argument('--drop-requests', type=int, default=5000, help='registrations in the ticket drop')
+    args = parser.parse_args()
+    with app.app_context():
+        db.create_all()
+    if not run_double_submit(args.requests, args.workers):
+        sys.exit('FAILED: duplicate or missing registration')
+    if not run_ticket_drop(args.drop_requests, args.workers, args.capacity, hot=True):
+        sys.exit('FAILED: hot event oversold or undersold')
+    if not run_ticket_drop(args.drop_requests, args.workers, args.capacity, hot=False):
+        sys.exit('FAILED: registrations lost across unrelated events')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+import sys
+import os
+import argparse
+import json
+import random
+import re
+import socket
+import subprocess
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar
+
+from sqlalchemy import create_engine, text
+from datetime import datetime, timedelta
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+API_ROUTES = ('/api/user_registration_trends', '/api/event_popularity', '/api/events_per_venue',
+              '/api/attendees_per_event', '/api/event_dates_distribution', '/api/events_per_user',
+              '/api/average_attendees', '/api/dashboard')
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    # Time the route itself, not the listing page it redirects to.
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+class Client:
+    """A logged-in browser session against the app under test."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()), NoRedirect)
+
+    def request(self, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        try:
+            with self.opener.open(self.base_url + path, body, timeout=120) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def login(self, email, password='password123'):
+        status, page = self.request('/login')
+        token = re.search(rb'name="csrf_token" type="hidden" value="([^"]+)"', page).group(1).decode()
+        status, _ = self.request('/login', {'csrf_token': token, 'email': email, 'password': password})
+        if status != 302:
+            raise RuntimeError('login failed for %s (HTTP %d)' % (email, status))
+        return status
+
+def percentile(samples, fraction):
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+def drive(clients, requests, make_request):
+    """Send `requests` requests spread over the clients, one thread per client."""
+    def worker(index):
+        client = clients[index]
+        timings = []
+        for i in range(index, requests, len(clients)):
+            path, data = make_request(i)
+            start = time.perf_counter()
+            status, _ = client.request(path, data)
+            timings.append(((time.perf_counter() - start) * 1000, status))
+        return timings
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(clients)) as pool:
+        timings = [timing for result in pool.map(worker, range(len(clients))) for timing in result]
+    elapsed = time.perf_counter() - start
+    if not timings:
+        return {'requests': 0}
+    latencies = sorted(latency for latency, _ in timings)
+    return {'requests': len(timings),
+            'errors': sum(1 for _, status in timings if status >= 400),
+            'throughput_rps': round(len(timings) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 0.50), 2),
+            'p95_ms': round(percentile(latencies, 0.95), 2),
+            'p99_ms': round(percentile(latencies, 0.99), 2)}
+
+def ids(engine, sql, **params):
+    with engine.connect() as connection:
+        return [row[0] for row in connection.execute(text(sql), params)]
+
+def run_routes(base_url, engine, requests, concurrency, seed):
+    rng = random.Random(seed)
+    tag = 'bench%d' % int(time.time())
+    clients = [Client(base_url) for _ in range(concurrency)]
+    results = {}
+    for i, client in enumerate(clients):
+        client.login('user%07d@example.com' % i)
+
+    user_ids = ids(engine, 'SELECT user_id FROM users ORDER BY user_id LIMIT 1000')
+    venue_ids = ids(engine, 'SELECT venue_id FROM venues ORDER BY venue_id LIMIT 1000')
+    event_ids = ids(engine, 'SELECT event_id FROM events')
+
+    for path in ('/events', '/events?q=concert', '/events?venue=1&seats=1', '/api/venues/nearby?lat=40&lng=0',
+                 '/api/venues/available?start=2024-03-01T18:00&end=2024-03-01T21:00&capacity=500', '/users', '/venues', '/add_event', '/visualizations') + API_ROUTES:
+        results['GET ' + path] = drive(clients, requests, lambda i, path=path: (path, None))
+
+    results['POST /register_event'] = drive(
+        clients, requests, lambda i: ('/register_event/%d' % rng.choice(event_ids), {}))
+
+    # CRUD cycles: create a batch, then update and delete exactly those rows.
+    results['POST /add_venue'] = drive(clients, requests, lambda i: (
+        '/add_venue', {'name': '%s venue %d' % (tag, i), 'location': '1 Bench Road', 'capacity': 500}))
+    created = ids(engine, 'SELECT venue_id FROM venues WHERE name LIKE :tag', tag=tag + ' venue %')
+    results['POST /update_venue'] = drive(clients, len(created), lambda i: (
+        '/update_venue/%d' % created[i], {'name': '%s venue %d' % (tag, i), 'location': '2 Bench Road', 'capacity': 600}))
+
+    # Every form gets its own time slot, so no two bench bookings overlap.
+    def event_form(i, slot):
+        start = datetime(2030, 1, 1) + timedelta(hours=3 * slot)
+        return {'user_id': rng.choice(user_ids), 'venue_id': rng.choice(venue_ids),
+                'title': '%s event %d' % (tag, i), 'description': 'Benchmark event.',
+                'event_date': start.strftime('%Y-%m-%dT%H:%M'),
+                'end_date': (start + timedelta(hours=2)).strftime('%Y-%m-%dT%H:%M')}
+    results['POST /add_event'] = drive(clients, requests, lambda i: ('/add_event', event_form(i, i)))
+    created_events = ids(engine, 'SELECT event_id FROM events WHERE title LIKE :tag', tag=tag + ' event %')
+    results['GET /update_event'] = drive(clients, len(created_events),
+                                         lambda i: ('/update_event/%d' % created_events[i], None))
+    results['POST /update_event'] = drive(clients, len(created_events), lambda i: (
+        '/update_event/%d' % created_events[i], event_form(i, requests + i)))
+    results['POST /delete_event'] = drive(clients, len(created_events),
+                                          lambda i: ('/delete_event/%d' % created_events[i], {}))
+    results['POST /delete_venue'] = drive(clients, len(created), lambda i: ('/delete_venue/%d' % created[i], {}))
+
+    results['POST /add_user'] = drive(clients, requests, lambda i: (
+        '/add_user', {'username': '%s_%d' % (tag, i), 'email': '%s_%d@example.com' % (tag, i), 'password': 'password123'}))
+    with engine.connect() as connection:
+        created_users = connection.execute(text('SELECT user_id, username FROM users WHERE username LIKE :tag'),
+                                           {'tag': tag + '%'}).all()
+    results['POST /update_user'] = drive(clients, len(created_users), lambda i: (
+        '/update_user/%d' % created_users[i][0],
+        {'username': created_users[i][1], 'email': '%s@example.org' % created_users[i][1], 'password': ''}))
+    results['POST /delete_user'] = drive(clients, len(created_users), lambda i: ('/delete_user/%d' % created_users[i][0], {}))
+    return results
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def start_server(env, port):
+    server = subprocess.Popen([sys.executable, '-m', 'flask', 'run', '--port', str(port), '--with-threads', '--no-reload'],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen('http://127.0.0.1:%d/login' % port, timeout=1).close()
+            return server
+        except OSError:
+            if server.poll() is not None:
+                break
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError('the app did not start on port %d' % port)
+
+def bench_scale(scale, args, workdir):
+    url = args.database_url.format(scale=str(scale).replace('.', '_')) if args.database_url \
+        else 'sqlite:///' + os.path.join(workdir, 'bench_%s.db' % str(scale).replace('.', '_'))
+    env = dict(os.environ, DATABASE_URL=url, FLASK_APP='app.py')
+    subprocess.run([sys.executable, '-m', 'flask', 'db', 'upgrade'], cwd=ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    start = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(ROOT, 'scripts', 'generate_workload.py'),
+                    '--seed', str(args.seed), '--scale', str(scale)], cwd=ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+    seed_seconds = time.perf_counter() - start
+    engine = create_engine(url)
+    rows = {table: ids(engine, 'SELECT COUNT(*) FROM %s' % table)[0] for table in ('users', 'venues', 'events', 'attendees')}
+    port = free_port()
+    server = start_server(env, port)
+    try:
+        routes = run_routes('http://127.0.0.1:%d' % port, engine, args.requests, args.concurrency, args.seed)
+    finally:
+        server.terminate()
+        server.wait()
+        engine.dispose()
+    print('scale %s: %s' % (scale, ', '.join('%s p95 %.1fms' % (name, result['p95_ms'])
+                                             for name, result in routes.items() if result['requests'])),
+          file=sys.stderr)
+    return {'scale': scale, 'database': engine.dialect.name, 'seed_seconds': round(seed_seconds, 1),
+            'rows': rows, 'routes': routes}
+
+def compare(report, baseline):
+    for run in report['runs']:
+        before = next((old for old in baseline['runs'] if old['scale'] == run['scale']), None)
+        if before is None:
+            continue
+        print('scale %s (p95 ms, before -> after)' % run['scale'], file=sys.stderr)
+        for name, result in run['routes'].items():
+            old = before['routes'].get(name, {})
+            if 'p95_ms' in result and 'p95_ms' in old:
+                print('  %-36s %9.1f -> %9.1f  (%+.0f%%)' % (name, old['p95_ms'], result['p95_ms'],
+                                                          (result['p95_ms'] / old['p95_ms'] - 1) * 100 if old['p95_ms'] else 0),
+                      file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description='Seed databases at several scale factors, start the app against '
+                                                 'each and report per-route throughput and latency percentiles.')
+    parser.add_argument('--scales', default='0.1,1', help='comma-separated generate_workload.py scale factors')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--requests', type=int, default=200, help='requests per route')
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent logged-in clients')
+    parser.add_argument('--database-url', help='URL template with a {scale} placeholder, e.g. '
+                                               'postgresql://localhost/ems_bench_{scale} (default: SQLite files)')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    parser.add_argument('--baseline', help='earlier JSON report to print p95 changes against')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='ems_bench_')
+    report = {'started_at': datetime.utcnow().isoformat(), 'requests_per_route': args.requests,
+              'concurrency': args.concurrency, 'seed': args.seed,
+              'commit': subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       capture_output=True, text=True).stdout.strip() or None,
+              'runs': [bench_scale(float(scale), args, workdir) for scale in args.scales.split(',')]}
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(report, json.load(f))
+
+if __name__ == '__main__':
+    main()
@@ -1,117 +1,311 @@
 import sys
 import os
+import argparse
+import csv
+import io
+import json
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 
 # Ensure the parent directory is in the system path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from app import create_app, db
-from models import User, Venue, Event, Attendee
-from werkzeug.security import generate_password_hash
-from datetime import datetime, timedelta
-
-def create_sample_data():
-    app = create_app()
-    with app.app_context():
-        # Create users with different registration dates
-        users_data = [
-            {'username': 'john_doe', 'email': 'john@example.com', 'date': datetime(2024, 1, 1)},
-            {'username': 'jane_smith', 'email': 'jane@example.com', 'date': datetime(2024, 2, 1)},
-            {'username': 'alice_wonder', 'email': 'alice@example.com', 'date': datetime(2024, 3, 1)},
-            {'username': 'bob_builder', 'email': 'bob@example.com', 'date': datetime(2024, 4, 1)},
-            {'username': 'mike_tyson', 'email': 'mike@example.com', 'date': datetime(2024, 5, 1)},
-            {'username': 'susan_clark', 'email': 'susan@example.com', 'date': datetime(2024, 6, 1)},
-            {'username': 'david_lee', 'email': 'david@example.com', 'date': datetime(2024, 7, 1)},
-            {'username': 'emma_brown', 'email': 'emma@example.com', 'date': datetime(2024, 8, 1)},
-            {'username': 'noah_white', 'email': 'noah@example.com', 'date': datetime(2024, 9, 1)},
-            {'username': 'olivia_green', 'email': 'olivia@example.com', 'date': datetime(2024, 10, 1)},
-            {'username': 'liam_black', 'email': 'liam@example.com', 'date': datetime(2024, 11, 1)},
-            {'username': 'ava_blue', 'email': 'ava@example.com', 'date': datetime(2024, 12, 1)}
-        ]
-
-        users = []
-        for user_data in users_data:
-            if not User.query.filter_by(username=user_data['username']).first():
-                user = User(
-                    username=user_data['username'],
-                    password_hash=generate_password_hash('password123', method='pbkdf2:sha256'),
-                    email=user_data['email'],
-                    created_at=user_data['date']
-                )
-                users.append(user)
-
-        if users:
-            db.session.add_all(users)
-            db.session.commit()
-
-        # Retrieve user IDs
-        user_ids = {user.username: user.user_id for user in User.query.all()}
-
-        # Create venues
-        venue_names = ['Expo Center', 'Outdoor Arena', 'Tech Park', 'Convention Hall']
-        venues = [
-            Venue(name='Expo Center', location='456 Expo Drive', capacity=1000),
-            Venue(name='Outdoor Arena', location='789 Arena Road', capacity=3000),
-            Venue(name='Tech Park', location='123 Tech Lane', capacity=800),
-            Venue(name='Convention Hall', location='321 Convention Blvd', capacity=1200)
-        ]
-
-        existing_venues = {venue.name: venue for venue in Venue.query.filter(Venue.name.in_(venue_names)).all()}
-        new_venues = [venue for venue in venues if venue.name not in existing_venues]
-
-        if new_venues:
-            db.session.add_all(new_venues)
-            db.session.commit()
-
-        # Retrieve venue IDs
-        venue_ids = {venue.name: venue.venue_id for venue in Venue.query.filter(Venue.name.in_(venue_names)).all()}
-
-        # Create events
-        event_titles = ['Music Festival', 'Food Carnival', 'Tech Expo', 'Art Exhibition', 'Business Conference', 'Startup Pitch', 'Health Workshop', 'Gaming Convention']
-        events = [
-            Event(user_id=user_ids['john_doe'], venue_id=venue_ids['Expo Center'], title='Music Festival', description='A grand music festival.', event_date=datetime(2024, 5, 20, 18, 0)),
-            Event(user_id=user_ids['jane_smith'], venue_id=venue_ids['Outdoor Arena'], title='Food Carnival', description='A carnival with diverse food stalls.', event_date=datetime(2024, 6, 15, 12, 0)),
-            Event(user_id=user_ids['alice_wonder'], venue_id=venue_ids['Tech Park'], title='Tech Expo', description='An exhibition of the latest tech.', event_date=datetime(2024, 7, 10, 10, 0)),
-            Event(user_id=user_ids['bob_builder'], venue_id=venue_ids['Convention Hall'], title='Art Exhibition', description='Showcasing modern art.', event_date=datetime(2024, 8, 5, 9, 0)),
-            Event(user_id=user_ids['mike_tyson'], venue_id=venue_ids['Expo Center'], title='Business Conference', description='A conference for business professionals.', event_date=datetime(2024, 9, 12, 9, 0)),
-            Event(user_id=user_ids['susan_clark'], venue_id=venue_ids['Outdoor Arena'], title='Startup Pitch', description='Pitching event for startups.', event_date=datetime(2024, 10, 20, 14, 0)),
-            Event(user_id=user_ids['david_lee'], venue_id=venue_ids['Tech Park'], title='Health Workshop', description='A workshop on health and wellness.', event_date=datetime(2024, 11, 22, 11, 0)),
-            Event(user_id=user_ids['emma_brown'], venue_id=venue_ids['Convention Hall'], title='Gaming Convention', description='A convention for gaming enthusiasts.', event_date=datetime(2024, 12, 5, 10, 0))
-        ]
-
-        existing_events = {event.title: event for event in Event.query.filter(Event.title.in_(event_titles)).all()}
-        new_events = [event for event in events if event.title not in existing_events]
-
-        if new_events:
-            db.session.add_all(new_events)
-            db.session.commit()
-
-        # Retrieve event IDs
-        event_ids = {event.title: event.event_id for event in Event.query.filter(Event.title.in_(event_titles)).all()}
-
-        # Create attendees
-        attendees = [
-            Attendee(user_id=user_ids['jane_smith'], event_id=event_ids['Music Festival']),
-            Attendee(user_id=user_ids['alice_wonder'], event_id=event_ids['Music Festival']),
-            Attendee(user_id=user_ids['bob_builder'], event_id=event_ids['Food Carnival']),
-            Attendee(user_id=user_ids['mike_tyson'], event_id=event_ids['Food Carnival']),
-            Attendee(user_id=user_ids['susan_clark'], event_id=event_ids['Tech Expo']),
-            Attendee(user_id=user_ids['david_lee'], event_id=event_ids['Tech Expo']),
-            Attendee(user_id=user_ids['john_doe'], event_id=event_ids['Art Exhibition']),
-            Attendee(user_id=user_ids['jane_smith'], event_id=event_ids['Art Exhibition']),
-            Attendee(user_id=user_ids['alice_wonder'], event_id=event_ids['Business Conference']),
-            Attendee(user_id=user_ids['bob_builder'], event_id=event_ids['Business Conference']),
-            Attendee(user_id=user_ids['mike_tyson'], event_id=event_ids['Startup Pitch']),
-            Attendee(user_id=user_ids['susan_clark'], event_id=event_ids['Startup Pitch']),
-            Attendee(user_id=user_ids['david_lee'], event_id=event_ids['Health Workshop']),
-            Attendee(user_id=user_ids['emma_brown'], event_id=event_ids['Health Workshop']),
-            Attendee(user_id=user_ids['noah_white'], event_id=event_ids['Gaming Convention']),
-            Attendee(user_id=user_ids['olivia_green'], event_id=event_ids['Gaming Convention'])
-        ]
-
-        db.session.add_all(attendees)
+from app import app, db, User, Venue, Event, Attendee, dialect_insert, reconcile_attendee_counts, bump_versions, \
+    make_password_hash, DEFAULT_EVENT_DURATION
+from sqlalchemy.schema import CreateTable
+from datetime import datetime
+
+SAMPLE_USERS = [
+    {'username': 'john_doe', 'email': 'john@example.com', 'password': 'password123', 'created_at': datetime(2024, 1, 1)},
+    {'username': 'jane_smith', 'email': 'jane@example.com', 'password': 'password123', 'created_at': datetime(2024, 2, 1)},
+    {'username': 'alice_wonder', 'email': 'alice@example.com', 'password': 'password123', 'created_at': datetime(2024, 3, 1)},
+    {'username': 'bob_builder', 'email': 'bob@example.com', 'password': 'password123', 'created_at': datetime(2024, 4, 1)},
+    {'username': 'mike_tyson', 'email': 'mike@example.com', 'password': 'password123', 'created_at': datetime(2024, 5, 1)},
+    {'username': 'susan_clark', 'email': 'susan@example.com', 'password': 'password123', 'created_at': datetime(2024, 6, 1)},
+    {'username': 'david_lee', 'email': 'david@example.com', 'password': 'password123', 'created_at': datetime(2024, 7, 1)},
+    {'username': 'emma_brown', 'email': 'emma@example.com', 'password': 'password123', 'created_at': datetime(2024, 8, 1)},
+    {'username': 'noah_white', 'email': 'noah@example.com', 'password': 'password123', 'created_at': datetime(2024, 9, 1)},
+    {'username': 'olivia_green', 'email': 'olivia@example.com', 'password': 'password123', 'created_at': datetime(2024, 10, 1)},
+    {'username': 'liam_black', 'email': 'liam@example.com', 'password': 'password123', 'created_at': datetime(2024, 11, 1)},
+    {'username': 'ava_blue', 'email': 'ava@example.com', 'password': 'password123', 'created_at': datetime(2024, 12, 1)}
+]
+
+SAMPLE_VENUES = [
+    {'name': 'Expo Center', 'location': '456 Expo Drive', 'capacity': 1000},
+    {'name': 'Outdoor Arena', 'location': '789 Arena Road', 'capacity': 3000},
+    {'name': 'Tech Park', 'location': '123 Tech Lane', 'capacity': 800},
+    {'name': 'Convention Hall', 'location': '321 Convention Blvd', 'capacity': 1200}
+]
+
+SAMPLE_EVENTS = [
+    {'username': 'john_doe', 'venue': 'Expo Center', 'title': 'Music Festival', 'description': 'A grand music festival.', 'event_date': datetime(2024, 5, 20, 18, 0)},
+    {'username': 'jane_smith', 'venue': 'Outdoor Arena', 'title': 'Food Carnival', 'description': 'A carnival with diverse food stalls.', 'event_date': datetime(2024, 6, 15, 12, 0)},
+    {'username': 'alice_wonder', 'venue': 'Tech Park', 'title': 'Tech Expo', 'description': 'An exhibition of the latest tech.', 'event_date': datetime(2024, 7, 10, 10, 0)},
+    {'username': 'bob_builder', 'venue': 'Convention Hall', 'title': 'Art Exhibition', 'description': 'Showcasing modern art.', 'event_date': datetime(2024, 8, 5, 9, 0)},
+    {'username': 'mike_tyson', 'venue': 'Expo Center', 'title': 'Business Conference', 'description': 'A conference for business professionals.', 'event_date': datetime(2024, 9, 12, 9, 0)},
+    {'username': 'susan_clark', 'venue': 'Outdoor Arena', 'title': 'Startup Pitch', 'description': 'Pitching event for startups.', 'event_date': datetime(2024, 10, 20, 14, 0)},
+    {'username': 'david_lee', 'venue': 'Tech Park', 'title': 'Health Workshop', 'description': 'A workshop on health and wellness.', 'event_date': datetime(2024, 11, 22, 11, 0)},
+    {'username': 'emma_brown', 'venue': 'Convention Hall', 'title': 'Gaming Convention', 'description': 'A convention for gaming enthusiasts.', 'event_date': datetime(2024, 12, 5, 10, 0)}
+]
+
+SAMPLE_ATTENDEES = [
+    {'username': 'jane_smith', 'event': 'Music Festival'},
+    {'username': 'alice_wonder', 'event': 'Music Festival'},
+    {'username': 'bob_builder', 'event': 'Food Carnival'},
+    {'username': 'mike_tyson', 'event': 'Food Carnival'},
+    {'username': 'susan_clark', 'event': 'Tech Expo'},
+    {'username': 'david_lee', 'event': 'Tech Expo'},
+    {'username': 'john_doe', 'event': 'Art Exhibition'},
+    {'username': 'jane_smith', 'event': 'Art Exhibition'},
+    {'username': 'alice_wonder', 'event': 'Business Conference'},
+    {'username': 'bob_builder', 'event': 'Business Conference'},
+    {'username': 'mike_tyson', 'event': 'Startup Pitch'},
+    {'username': 'susan_clark', 'event': 'Startup Pitch'},
+    {'username': 'david_lee', 'event': 'Health Workshop'},
+    {'username': 'emma_brown', 'event': 'Health Workshop'},
+    {'username': 'noah_white', 'event': 'Gaming Convention'},
+    {'username': 'olivia_green', 'event': 'Gaming Convention'}
+]
+
+# Per-connection staging tables keyed by natural keys (username, venue name,
+# event title); each batch is resolved to ids inside the database.
+staging = db.MetaData()
+STAGING = {
+    'users': db.Table('stage_users', staging,
+                      db.Column('username', db.String(50)), db.Column('email', db.String(100)),
+                      db.Column('password_hash', db.String(128)), db.Column('created_at', db.DateTime),
+                      prefixes=['TEMPORARY']),
+    'venues': db.Table('stage_venues', staging,
+                       db.Column('name', db.String(100)), db.Column('location', db.String(255)),
+                       db.Column('capacity', db.Integer), db.Column('latitude', db.Float),
+                       db.Column('longitude', db.Float), db.Column('created_at', db.DateTime),
+                       prefixes=['TEMPORARY']),
+    'events': db.Table('stage_events', staging,
+                       db.Column('username', db.String(50)), db.Column('venue', db.String(100)),
+                       db.Column('title', db.String(100)), db.Column('description', db.Text),
+                       db.Column('event_date', db.DateTime), db.Column('end_date', db.DateTime),
+                       db.Column('created_at', db.DateTime), prefixes=['TEMPORARY']),
+    'attendees': db.Table('stage_attendees', staging,
+                          db.Column('username', db.String(50)), db.Column('event', db.String(100)),
+                          db.Column('registration_date', db.DateTime),
+                          prefixes=['TEMPORARY']),
+}
+
+def read_records(path):
+    """Stream dicts from a .csv (with header) or .jsonl file."""
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+def _text(value):
+    return None if value in (None, '') else str(value)
+
+def _int(value):
+    return None if value in (None, '') else int(value)
+
+def _float(value):
+    return None if value in (None, '') else float(value)
+
+def _timestamp(value, default=None):
+    if value in (None, ''):
+        return default
+    return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+def normalize_users(records):
+    now = datetime.utcnow()
+    for record in records:
+        # Pre-hashed credentials are stored as they are; plain passwords are
+        # hashed per batch in hash_passwords.
+        password_hash = _text(record.get('password_hash'))
+        yield {'username': _text(record['username']), 'email': _text(record['email']),
+               'password': None if password_hash else record['password'],
+               'password_hash': password_hash, 'created_at': _timestamp(record.get('created_at'), now)}
+
+def hash_passwords(rows, pool=None):
+    # Drop users that already exist before paying for their hashes, so a
+    # re-run of an import does not hash anything again.
+    existing = set(db.session.scalars(db.select(User.username)
+                                      .where(User.username.in_([row['username'] for row in rows]))))
+    rows = [row for row in rows if row['username'] not in existing]
+    pending = [row for row in rows if row['password_hash'] is None]
+    passwords = [row['password'] for row in pending]
+    if pool is not None and passwords:
+        hashes = pool.map(make_password_hash, passwords, chunksize=max(1, len(passwords) // ((os.cpu_count() or 1) * 4)))
+    else:
+        hashes = map(make_password_hash, passwords)
+    for row, password_hash in zip(pending, hashes):
+        row['password_hash'] = password_hash
+    for row in rows:
+        del row['password']
+    return rows
+
+def normalize_venues(records):
+    now = datetime.utcnow()
+    for record in records:
+        yield {'name': _text(record['name']), 'location': _text(record.get('location')),
+               'capacity': _int(record.get('capacity')), 'latitude': _float(record.get('latitude')),
+               'longitude': _float(record.get('longitude')), 'created_at': _timestamp(record.get('created_at'), now)}
+
+def normalize_events(records):
+    now = datetime.utcnow()
+    for record in records:
+        event_date = _timestamp(record['event_date'])
+        end_date = _timestamp(record.get('end_date'), event_date and event_date + DEFAULT_EVENT_DURATION)
+        yield {'username': _text(record['username']), 'venue': _text(record['venue']),
+               'title': _text(record['title']), 'description': _text(record.get('description')),
+               'event_date': event_date, 'end_date': end_date, 'created_at': _timestamp(record.get('created_at'), now)}
+
+def drop_double_bookings(rows, pool=None):
+    # Of the bookings in a batch that overlap at one venue keep the earliest;
+    # insert_events skips those overlapping events already in the database.
+    timed = sorted((row for row in rows if row['event_date'] and row['end_date']),
+                   key=lambda row: (row['venue'] or '', row['event_date'], row['end_date']))
+    kept, booked_until = [row for row in rows if not (row['event_date'] and row['end_date'])], {}
+    for row in timed:
+        if row['end_date'] > row['event_date']:
+            if row['event_date'] < booked_until.get(row['venue'], row['event_date']):
+                continue
+            booked_until[row['venue']] = row['end_date']
+        kept.append(row)
+    return kept
+
+def normalize_attendees(records):
+    now = datetime.utcnow()
+    for record in records:
+        yield {'username': _text(record['username']), 'event': _text(record['event']),
+               'registration_date': _timestamp(record.get('registration_date'), now)}
+
+def insert_users(stage):
+    columns = ['username', 'email', 'password_hash', 'created_at']
+    rows = db.select(*[stage.c[name] for name in columns]).where(db.true())
+    return dialect_insert(User).from_select(columns, rows).on_conflict_do_nothing()
+
+def insert_venues(stage):
+    columns = ['name', 'location', 'capacity', 'latitude', 'longitude', 'created_at']
+    rows = db.select(*[stage.c[name] for name in columns]).where(~db.exists().where(Venue.name == stage.c.name))
+    return db.insert(Venue).from_select(columns, rows)
+
+def insert_events(stage):
+    user_id = db.select(User.user_id).where(User.username == stage.c.username).scalar_subquery()
+    venue_id = db.select(db.func.min(Venue.venue_id)).where(Venue.name == stage.c.venue).scalar_subquery()
+    resolved = db.select(user_id.label('user_id'), venue_id.label('venue_id'), stage.c.title, stage.c.description,
+                         stage.c.event_date, stage.c.end_date, stage.c.created_at).subquery()
+    columns = ['user_id', 'venue_id', 'title', 'description', 'event_date', 'end_date', 'created_at']
+    rows = db.select(*[resolved.c[name] for name in columns]).where(
+        resolved.c.user_id.is_not(None), resolved.c.venue_id.is_not(None),
+        ~db.exists().where(Event.title == resolved.c.title, Event.venue_id == resolved.c.venue_id,
+                           Event.event_date == resolved.c.event_date),
+        # The venue is already booked then (see overlapping_booking).
+        ~db.exists().where(Event.venue_id == resolved.c.venue_id, Event.event_date < resolved.c.end_date,
+                           Event.end_date > resolved.c.event_date, Event.end_date > Event.event_date))
+    return db.insert(Event).from_select(columns, rows)
+
+def insert_attendees(stage):
+    user_id = db.select(User.user_id).where(User.username == stage.c.username).scalar_subquery()
+    event_id = db.select(db.func.min(Event.event_id)).where(Event.title == stage.c.event).scalar_subquery()
+    resolved = db.select(user_id.label('user_id'), event_id.label('event_id'), stage.c.registration_date).subquery()
+    columns = ['user_id', 'event_id', 'registration_date']
+    rows = db.select(*[resolved.c[name] for name in columns]).where(
+        resolved.c.user_id.is_not(None), resolved.c.event_id.is_not(None))
+    return dialect_insert(Attendee).from_select(columns, rows) \
+        .on_conflict_do_nothing(index_elements=['user_id', 'event_id'])
+
+# entity -> (normalizer, batch de-duplication key, batch preparation, INSERT ... SELECT builder)
+ENTITIES = {
+    'users': (normalize_users, lambda row: row['username'], hash_passwords, insert_users),
+    'venues': (normalize_venues, lambda row: row['name'], None, insert_venues),
+    'events': (normalize_events, lambda row: (row['title'], row['venue'], row['event_date']), drop_double_bookings,
+               insert_events),
+    'attendees': (normalize_attendees, lambda row: (row['username'], row['event']), None, insert_attendees),
+}
+
+def stage_batch(stage, rows):
+    connection = db.session.connection()
+    connection.execute(CreateTable(stage, if_not_exists=True))
+    connection.execute(stage.delete())
+    if connection.dialect.name == 'postgresql':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([row[column.name] for column in stage.columns])
+        buffer.seek(0)
+        cursor = connection.connection.cursor()
+        cursor.copy_expert('COPY %s (%s) FROM STDIN WITH (FORMAT csv)'
+                           % (stage.name, ', '.join(column.name for column in stage.columns)), buffer)
+    else:
+        connection.execute(stage.insert(), rows)
+
+def load_records(entity, records, batch_size=10000, pool=None):
+    """Load an iterable of natural-key records in constant memory; returns (read, inserted).
+
+    `pool` is an optional ProcessPoolExecutor used to hash user passwords across cores.
+    """
+    normalize, key, prepare, build_insert = ENTITIES[entity]
+    stage = STAGING[entity]
+    statement = build_insert(stage)
+    rows = normalize(records)
+    read = inserted = 0
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        read += len(batch)
+        unique = list({key(row): row for row in reversed(batch)}.values())
+        if prepare is not None:
+            unique = prepare(unique, pool)
+        if not unique:
+            continue
+        stage_batch(stage, unique)
+        inserted += db.session.execute(statement).rowcount
         db.session.commit()
+    return read, inserted
+
+def finalize_load():
+    # Bring the SERIAL sequences past the loaded ids (replacing the manual
+    # setval calls in query_scripts.sql), then rebuild the derived counters.
+    if db.engine.dialect.name == 'postgresql':
+        for table, column in (('users', 'user_id'), ('venues', 'venue_id'), ('events', 'event_id'), ('attendees', 'attendee_id')):
+            db.session.execute(db.text('SELECT setval(pg_get_serial_sequence(:table, :column), COALESCE(MAX(%s), 0) + 1, false) FROM %s'
+                                       % (column, table)), {'table': table, 'column': column})
+        db.session.commit()
+    reconcile_attendee_counts()
+    bump_versions('users', 'venues', 'events', 'attendees')
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk load users, venues, events and attendees from CSV or JSONL '
+                                                 'files. Without any file, loads the built-in sample data.')
+    parser.add_argument('--users', help='username, email, password or password_hash, created_at')
+    parser.add_argument('--venues', help='name, location, capacity, latitude, longitude, created_at')
+    parser.add_argument('--events', help='username (organizer), venue (name), title, description, event_date, '
+                                         'end_date (default: 2 hours later), created_at')
+    parser.add_argument('--attendees', help='username, event (title), registration_date')
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='processes hashing user passwords (1 hashes in this process)')
+    args = parser.parse_args()
 
-        print("Sample data created successfully.")
+    sources = {entity: getattr(args, entity) for entity in ENTITIES}
+    if not any(sources.values()):
+        sources = {'users': SAMPLE_USERS, 'venues': SAMPLE_VENUES, 'events': SAMPLE_EVENTS, 'attendees': SAMPLE_ATTENDEES}
+    pool = ProcessPoolExecutor(max_workers=args.workers) if sources['users'] and args.workers > 1 else None
+    try:
+        with app.app_context():
+            for entity in ENTITIES:
+                source = sources[entity]
+                if not source:
+                    continue
+                records = read_records(source) if isinstance(source, str) else source
+                read, inserted = load_records(entity, records, args.batch_size, pool)
+                print('%s: %d read, %d inserted' % (entity, read, inserted))
+            finalize_load()
+            print("Data loaded successfully.")
+    finally:
+        if pool is not None:
+            pool.shutdown()
 
 if __name__ == '__main__':
-    create_sample_data()
+    main()
@@ -0,0 +1,184 @@
+import sys
+import os
+import argparse
+import csv
+import math
+import random
+import time
+
+# Ensure the parent directory is in the system path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app, make_password_hash
+from data_ingestion import load_records, finalize_load
+from datetime import datetime, timedelta
+
+# Rows per unit of --scale; scale 100 gives 1M users and ~5M attendees.
+USERS_PER_SCALE = 10000
+VENUES_PER_SCALE = 200
+EVENTS_PER_SCALE = 2000
+ATTENDEES_PER_SCALE = 50000
+
+# (share of venues, min seats, max seats)
+CAPACITY_MIX = ((0.50, 50, 200), (0.35, 200, 1000), (0.12, 1000, 5000), (0.03, 10000, 50000))
+CATEGORIES = ('Concert', 'Conference', 'Workshop', 'Meetup', 'Exhibition', 'Festival', 'Match', 'Screening')
+# (day of year, relative height) of the yearly signup peaks
+SIGNUP_PEAKS = ((15, 1.5), (250, 1.0))
+# Venue locations: each venue sits near one of CITIES city centres, scattered
+# over a few kilometres, with centres spread over the inhabited latitudes.
+CITIES = 50
+EVENT_HOURS = 2
+START = datetime(2023, 1, 1)
+DAYS = 730
+
+class Workload:
+    """Deterministic synthetic data set: the same seed and scale always produce the same rows."""
+
+    def __init__(self, seed, scale, zipf_s=1.1):
+        self.seed = seed
+        self.users = int(USERS_PER_SCALE * scale)
+        self.venues = max(1, int(VENUES_PER_SCALE * scale))
+        self.events = max(1, int(EVENTS_PER_SCALE * scale))
+        self.attendees = int(ATTENDEES_PER_SCALE * scale)
+        self.zipf_s = zipf_s
+        # Every entity draws from its own stream, so each can be generated on
+        # its own and in any order.
+        rng = self.rng('venues')
+        self.capacities = [self.capacity(rng) for _ in range(self.venues)]
+        # Start slots are at least EVENT_HOURS apart, so one booking per venue
+        # and slot never overlaps another.
+        rng = self.rng('events')
+        self.event_rows, booked = [], set()
+        while len(self.event_rows) < self.events:
+            row = (rng.randrange(self.users), rng.randrange(self.venues),
+                   START + timedelta(days=rng.randrange(DAYS), hours=rng.choice((10, 14, 18, 20))))
+            if row[1:] not in booked:
+                booked.add(row[1:])
+                self.event_rows.append(row)
+
+    def rng(self, stream):
+        return random.Random('%s-%s' % (self.seed, stream))
+
+    def capacity(self, rng):
+        roll = rng.random()
+        for share, low, high in CAPACITY_MIX:
+            if roll < share:
+                break
+            roll -= share
+        return rng.randint(low, high)
+
+    def username(self, i):
+        return 'user%07d' % i
+
+    def title(self, i):
+        return 'Event %07d: %s' % (i, CATEGORIES[i % len(CATEGORIES)])
+
+    def venue_name(self, i):
+        return 'Venue %05d' % i
+
+    def generate_users(self, password_hash):
+        rng = self.rng('users')
+        # Seasonal signup curve: New Year and back-to-school bumps on top of
+        # steady growth.
+        cumulative, total = [], 0
+        for day in range(DAYS):
+            season = 1 + sum(height * math.exp(-(min(abs(day % 365 - peak), 365 - abs(day % 365 - peak)) / 25) ** 2)
+                             for peak, height in SIGNUP_PEAKS)
+            total += season * (1 + day / DAYS)
+            cumulative.append(total)
+        days = range(DAYS)
+        for start in range(0, self.users, 10000):
+            count = min(10000, self.users - start)
+            signup_days = rng.choices(days, cum_weights=cumulative, k=count)
+            for i, day in enumerate(signup_days, start):
+                yield {'username': self.username(i), 'email': '%s@example.com' % self.username(i),
+                       'password_hash': password_hash,
+                       'created_at': START + timedelta(days=day, seconds=rng.randrange(86400))}
+
+    def city_centres(self):
+        rng = self.rng('cities')
+        return [(rng.uniform(-45, 60), rng.uniform(-180, 180)) for _ in range(CITIES)]
+
+    def generate_venues(self):
+        rng = self.rng('venue-details')
+        geo = self.rng('venue-geo')
+        centres = self.city_centres()
+        for i, capacity in enumerate(self.capacities):
+            city = rng.randint(1, CITIES)
+            lat, lng = centres[city - 1]
+            yield {'name': self.venue_name(i), 'location': '%d Main Street, City %d' % (rng.randint(1, 999), city),
+                   'capacity': capacity, 'latitude': round(lat + geo.gauss(0, 0.05), 6),
+                   'longitude': round((lng + geo.gauss(0, 0.05) + 180) % 360 - 180, 6), 'created_at': START}
+
+    def generate_events(self):
+        for i, (organizer, venue, event_date) in enumerate(self.event_rows):
+            yield {'username': self.username(organizer), 'venue': self.venue_name(venue), 'title': self.title(i),
+                   'description': 'Synthetic %s #%d.' % (CATEGORIES[i % len(CATEGORIES)].lower(), i),
+                   'event_date': event_date, 'end_date': event_date + timedelta(hours=EVENT_HOURS),
+                   'created_at': event_date - timedelta(days=90)}
+
+    def event_sizes(self):
+        # Zipf popularity over a shuffled ranking, capped at each venue's
+        # capacity; the overflow of sold-out events is not redistributed.
+        ranks = list(range(1, self.events + 1))
+        self.rng('popularity').shuffle(ranks)
+        weights = [1 / rank ** self.zipf_s for rank in ranks]
+        total = sum(weights)
+        return [min(round(self.attendees * weight / total), self.capacities[venue], self.users)
+                for weight, (_, venue, _) in zip(weights, self.event_rows)]
+
+    def generate_attendees(self):
+        rng = self.rng('attendees')
+        for i, size in enumerate(self.event_sizes()):
+            event_date = self.event_rows[i][2]
+            for user in rng.sample(range(self.users), size):
+                yield {'username': self.username(user), 'event': self.title(i),
+                       'registration_date': event_date - timedelta(seconds=rng.randrange(60 * 86400))}
+
+    def write_csv(self, directory, password_hash):
+        os.makedirs(directory, exist_ok=True)
+        for entity, rows in self.streams(password_hash):
+            path = os.path.join(directory, entity + '.csv')
+            with open(path, 'w', newline='', encoding='utf-8') as f:
+                writer = None
+                for row in rows:
+                    if writer is None:
+                        writer = csv.DictWriter(f, fieldnames=list(row))
+                        writer.writeheader()
+                    writer.writerow(row)
+            print('wrote %s' % path)
+
+    def streams(self, password_hash):
+        return (('users', self.generate_users(password_hash)), ('venues', self.generate_venues()),
+                ('events', self.generate_events()), ('attendees', self.generate_attendees()))
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a deterministic synthetic workload (skewed event '
+                                                 'popularity, seasonal signups, mixed venue sizes) and bulk load it.')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='1.0 = %d users, %d venues, %d events, ~%d attendees'
+                             % (USERS_PER_SCALE, VENUES_PER_SCALE, EVENTS_PER_SCALE, ATTENDEES_PER_SCALE))
+    parser.add_argument('--zipf', type=float, default=1.1, help='Zipf exponent of event popularity')
+    parser.add_argument('--batch-size', type=int, default=20000)
+    parser.add_argument('--output-dir', help='write CSV files for scripts/data_ingestion.py instead of loading')
+    args = parser.parse_args()
+
+    workload = Workload(args.seed, args.scale, args.zipf)
+    # One shared hash: every synthetic user logs in with 'password123'.
+    password_hash = make_password_hash('password123')
+    if args.output_dir:
+        workload.write_csv(args.output_dir, password_hash)
+        return
+    with app.app_context():
+        for entity, rows in workload.streams(password_hash):
+            start = time.perf_counter()
+            read, inserted = load_records(entity, rows, args.batch_size)
+            elapsed = time.perf_counter() - start
+            print('%s: %d generated, %d inserted in %.1fs (%.0f rows/s)'
+                  % (entity, read, inserted, elapsed, read / elapsed if elapsed else 0))
+        finalize_load()
+        print("Workload loaded successfully.")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+import sys
+import os
+import argparse
+import json
+import statistics
+import time
+
+# Ensure the parent directory is in the system path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app, db, Event, Attendee, ANALYTICS_DATASETS, register_attendee
+from bench_registration import create_fixture, create_users
+from datetime import datetime, timedelta
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+        db.session.rollback()
+    return {'p50_ms': round(statistics.median(samples), 3), 'max_ms': round(max(samples), 3)}
+
+def window_queries(days):
+    now = datetime.utcnow()
+    return {
+        'recent_registrations': db.select(db.func.count(Attendee.attendee_id))
+                                  .where(Attendee.registration_date >= now - timedelta(days=days)),
+        'upcoming_events': db.select(db.func.count(Event.event_id))
+                             .where(Event.event_date.between(now, now + timedelta(days=days))),
+    }
+
+def measure_aggregates(repeat, days, explain):
+    results = {}
+    for name, dataset in ANALYTICS_DATASETS.items():
+        try:
+            results[name] = timed(lambda: dataset(True), repeat)
+        except Exception as e:
+            db.session.rollback()
+            results[name] = {'error': str(e).splitlines()[0]}
+    for name, query in window_queries(days).items():
+        results[name] = timed(lambda: db.session.execute(query).scalar(), repeat)
+        if explain and db.engine.dialect.name == 'postgresql':
+            compiled = query.compile(db.engine, compile_kwargs={'literal_binds': True})
+            plan = db.session.execute(db.text('EXPLAIN (ANALYZE, BUFFERS) ' + str(compiled))).scalars().all()
+            results[name]['plan'] = plan
+    return results
+
+def measure_registration(count):
+    prefix = 'measure%d' % int(time.time() * 1000)
+    _, event_ids = create_fixture(prefix, capacity=count, events=1)
+    samples = []
+    for user_id in create_users(prefix, count):
+        start = time.perf_counter()
+        register_attendee(user_id, event_ids[0])
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {'count': count,
+            'p50_ms': round(samples[len(samples) // 2], 3),
+            'p95_ms': round(samples[int(len(samples) * 0.95) - 1], 3)}
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the analytics aggregates, time-window scans and '
+                                                 'registration inserts; run before and after a schema change.')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--days', type=int, default=30, help='width of the recent/upcoming time window')
+    parser.add_argument('--registrations', type=int, default=200)
+    parser.add_argument('--explain', action='store_true', help='include EXPLAIN ANALYZE plans (PostgreSQL)')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+    with app.app_context():
+        report = {
+            'database': db.engine.dialect.name,
+            'measured_at': datetime.utcnow().isoformat(),
+            'rows': {'events': Event.query.count(), 'attendees': Attendee.query.count()},
+            'queries': measure_aggregates(args.repeat, args.days, args.explain),
+            'registration_insert': measure_registration(args.registrations),
+        }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
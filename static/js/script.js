@@ -1,40 +1,18 @@
 document.addEventListener('DOMContentLoaded', function() {
-    fetch('/api/events_per_venue')
-        .then(response => response.json())
-        .then(data => createChart('eventsPerVenueChart', 'bar', data.labels, data.values, 'Events per Venue'));
-
-    fetch('/api/attendees_per_event')
-        .then(response => response.json())
-        .then(data => createChart('attendeesPerEventChart', 'bar', data.labels, data.values, 'Attendees per Event'));
-
-    fetch('/api/user_registration_trends')
-        .then(response => response.json())
-        .then(data => createChart('userRegistrationTrendsChart', 'line', data.labels, data.values, 'User Registration Trends'));
-
-    fetch('/api/event_popularity')
-        .then(response => response.json())
-        .then(data => createChart('eventPopularityChart', 'bar', data.labels, data.values, 'Event Popularity'));
-
-    fetch('/api/event_dates_distribution')
-        .then(response => response.json())
-        .then(data => createChart('eventDatesDistributionChart', 'bar', data.labels, data.values, 'Event Dates Distribution'));
-
-    fetch('/api/events_per_user')
+    fetch('/api/dashboard')
         .then(response => response.json())
         .then(data => {
-            createChart('eventsPerUserChart', 'bar', data.labels, data.values, 'Events per User');
-            createChart('eventsPerUserPieChart', 'pie', data.labels, data.values, 'Percentage of Events per User');
-        });
+            createChart('eventsPerVenueChart', 'bar', data.events_per_venue.labels, data.events_per_venue.values, 'Events per Venue');
+            createChart('attendeesPerEventChart', 'bar', data.attendees_per_event.labels, data.attendees_per_event.values, 'Attendees per Event');
+            createChart('userRegistrationTrendsChart', 'line', data.user_registration_trends.labels, data.user_registration_trends.values, 'User Registration Trends');
+            createChart('eventPopularityChart', 'bar', data.event_popularity.labels, data.event_popularity.values, 'Event Popularity');
+            createChart('eventDatesDistributionChart', 'bar', data.event_dates_distribution.labels, data.event_dates_distribution.values, 'Event Dates Distribution');
+            createChart('eventsPerUserChart', 'bar', data.events_per_user.labels, data.events_per_user.values, 'Events per User');
+            createChart('eventsPerUserPieChart', 'pie', data.events_per_user.labels, data.events_per_user.values, 'Percentage of Events per User');
+            createChart('eventsPerVenuePieChart', 'pie', data.events_per_venue.labels, data.events_per_venue.values, 'Percentage of Events per Venue');
 
-    fetch('/api/events_per_venue')
-        .then(response => response.json())
-        .then(data => createChart('eventsPerVenuePieChart', 'pie', data.labels, data.values, 'Percentage of Events per Venue'));
-
-    fetch('/api/average_attendees')
-        .then(response => response.json())
-        .then(data => {
             const avgAttendeesDiv = document.getElementById('averageAttendees');
-            avgAttendeesDiv.innerHTML = `<h3>Average Attendees per Event: ${data.value}</h3>`;
+            avgAttendeesDiv.innerHTML = `<h3>Average Attendees per Event: ${data.average_attendees.value}</h3>`;
         });
 
     function createChart(elementId, chartType, labels, data, title) {
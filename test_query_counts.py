@@ -0,0 +1,60 @@
+import re
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import app, db, User, Venue, Event, Attendee, make_password_hash
+
+N = 20
+
+# Statements per page once the logged-in user is cached: whatever the table sizes.
+EXPECTED = {'/events': 2, '/users': 1, '/venues': 1, '/update_event': 4}
+
+def seed(count, start):
+    # `count` more users, venues and events, and an attendee per user on the first event.
+    password_hash = make_password_hash('password123')
+    db.session.execute(db.insert(User), [
+        {'username': 'user%05d' % i, 'email': 'user%05d@example.com' % i, 'password_hash': password_hash}
+        for i in range(start, start + count)])
+    db.session.execute(db.insert(Venue), [
+        {'name': 'Venue %05d' % i, 'location': '1 Test Road', 'capacity': 1000} for i in range(start, start + count)])
+    user_ids = db.session.scalars(db.select(User.user_id).order_by(User.user_id)).all()
+    venue_ids = db.session.scalars(db.select(Venue.venue_id).order_by(Venue.venue_id)).all()
+    db.session.execute(db.insert(Event), [
+        {'user_id': user_ids[i % len(user_ids)], 'venue_id': venue_ids[i % len(venue_ids)], 'title': 'Event %05d' % i,
+         'description': 'Test event.', 'event_date': datetime(2030, 1, 1) + timedelta(days=i)}
+        for i in range(start, start + count)])
+    first_event = db.session.scalar(db.select(db.func.min(Event.event_id)))
+    db.session.execute(db.insert(Attendee), [{'user_id': user_id, 'event_id': first_event}
+                                             for user_id in user_ids[start:start + count]])
+    db.session.commit()
+    return first_event
+
+def query_count(client, path):
+    # user-015's Server-Timing header reports the statements each request ran.
+    response = client.get(path)
+    assert response.status_code == 200, path
+    return int(re.search(r'desc="(\d+) queries"', response.headers['Server-Timing']).group(1))
+
+@pytest.fixture(scope='module')
+def client():
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        db.create_all()
+        seed(N, 0)
+    client = app.test_client()
+    client.post('/login', data={'email': 'user00000@example.com', 'password': 'password123'})
+    return client
+
+def test_listing_and_detail_queries_do_not_grow_with_rows(client):
+    with app.app_context():
+        event_id = db.session.scalar(db.select(db.func.min(Event.event_id)))
+    paths = {'/events': '/events', '/users': '/users', '/venues': '/venues', '/update_event': '/update_event/%d' % event_id}
+    for path in paths.values():
+        query_count(client, path)  # warm the per-process caches (logged-in user)
+    small = {page: query_count(client, path) for page, path in paths.items()}
+    with app.app_context():
+        seed(9 * N, N)
+    large = {page: query_count(client, path) for page, path in paths.items()}
+    assert large == small
+    assert small == EXPECTED
@@ -0,0 +1,56 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+
+from app import app, db, User, Venue, Event, Attendee, register_attendee
+
+WORKERS = 8
+
+def create_event(prefix, capacity, users):
+    # An event at a venue seating `capacity`, and `users` users to register for it.
+    db.session.execute(db.insert(User), [
+        {'username': '%s_%d' % (prefix, i), 'email': '%s_%d@example.com' % (prefix, i), 'password_hash': 'x'}
+        for i in range(users + 1)])
+    user_ids = db.session.scalars(db.select(User.user_id).where(User.username.like(prefix + '\\_%', escape='\\'))
+                                  .order_by(User.user_id)).all()
+    venue = Venue(name=prefix + ' Hall', location='1 Test Road', capacity=capacity)
+    db.session.add(venue)
+    db.session.flush()
+    event = Event(user_id=user_ids[0], venue_id=venue.venue_id, title=prefix + ' Event',
+                  description='Concurrency test event.', event_date=datetime(2031, 1, 1, 18, 0))
+    db.session.add(event)
+    db.session.commit()
+    return event.event_id, user_ids[1:]
+
+def register_in_parallel(registrations):
+    def register(registration):
+        with app.app_context():
+            return register_attendee(*registration)
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        return Counter(pool.map(register, registrations))
+
+def seats_taken(event_id):
+    with app.app_context():
+        rows = db.session.scalar(db.select(db.func.count(Attendee.attendee_id)).where(Attendee.event_id == event_id))
+        return rows, db.session.get(Event, event_id).attendee_count
+
+@pytest.fixture(scope='module', autouse=True)
+def schema():
+    with app.app_context():
+        db.create_all()
+
+def test_parallel_double_submits_register_once():
+    with app.app_context():
+        event_id, (user_id,) = create_event('double', capacity=10, users=1)
+    results = register_in_parallel([(user_id, event_id)] * 32)
+    assert results == {'registered': 1, 'already_registered': 31}
+    assert seats_taken(event_id) == (1, 1)
+
+def test_hot_event_fills_to_capacity_without_overselling():
+    with app.app_context():
+        event_id, user_ids = create_event('hot', capacity=10, users=40)
+    results = register_in_parallel([(user_id, event_id) for user_id in user_ids])
+    assert results == {'registered': 10, 'sold_out': 30}
+    assert seats_taken(event_id) == (10, 10)